@@ -1,5 +1,62 @@
+import sys
+import time
 import pygame
 
+# Process-wide caches. SysFont scans the system fonts on every call, and the
+# screens draw the same labels and sprites each time they are shown. The
+# cached fonts and surfaces belong to the pygame session, so they are only
+# good until pygame.quit().
+TEXT_CACHE_SIZE = 512
+fonts = {}
+texts = {}
+sprites = {}
+
+def get_font(face, size):
+    key = (face, size)
+    font = fonts.get(key)
+    if font is None:
+        font = fonts[key] = pygame.font.SysFont(face, size)
+    return font
+
+def render_text(text, face, size, colour='black'):
+    key = (face, size, text, colour if isinstance(colour, (str, tuple)) else tuple(colour))
+    surface = texts.get(key)
+    if surface is None:
+        if len(texts) >= TEXT_CACHE_SIZE:
+            # Text that changes, like the search time, would otherwise keep
+            # adding entries, so the oldest one goes.
+            del texts[next(iter(texts))]
+        surface = texts[key] = get_font(face, size).render(text, True, pygame.Color(colour))
+    return surface
+
+def load_sprite(path, size):
+    key = (path, size)
+    sprite = sprites.get(key)
+    if sprite is None:
+        sprite = sprites[key] = pygame.transform.scale(pygame.image.load(path), size)
+    return sprite
+
+class StartupTimer:
+    # Prints how long each screen took to build, and when it was ready
+    # counting from the start of the process, on stderr.
+    def __init__(self, start=None, enabled=False):
+        self.start = time.perf_counter() if start is None else start
+        self.enabled = enabled
+        self.started = {}
+
+    def begin(self, name):
+        if self.enabled:
+            self.started[name] = time.perf_counter()
+
+    def end(self, name):
+        # Without a begin the time is counted from the start of the process.
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        duration = now - self.started.pop(name, self.start)
+        print(f"startup {name}: {duration * 1000:.1f} ms, ready {(now - self.start) * 1000:.1f} ms "
+              "after start", file=sys.stderr)
+
 
 class BasicInput():
 
@@ -7,9 +64,11 @@ class BasicInput():
                  FONT_STYLE="Times New Roman", FONT_COLOR='black', FONT_SIZE=25, defining_text='', text_offset=10,
                 ):
         self.rect = pygame.Rect(x, y, w+2, h+2)
-        self.FONT = pygame.font.SysFont(FONT_STYLE, FONT_SIZE)
+        self.FONT_STYLE = FONT_STYLE
+        self.FONT_SIZE = FONT_SIZE
+        self.FONT = get_font(FONT_STYLE, FONT_SIZE)
         self.defining_text = defining_text
-        self.defining_text_surface = self.FONT.render(self.defining_text, True, pygame.Color(FONT_COLOR))
+        self.defining_text_surface = render_text(self.defining_text, FONT_STYLE, FONT_SIZE, FONT_COLOR)
         self.defining_text_pos = (text_offset, self.rect.y)
         self.active = False
 
@@ -46,8 +105,8 @@ class NumericalInput(BasicInput):
         super().__init__(x=x, y=y, w=w, h=h, defining_text=defining_text, text_offset=defining_text_offset)
 
         self.text = text
-        self.TEXT_COLOR = pygame.Color(TEXT_COLOR)
-        self.txt_surface = self.FONT.render(self.text, True, self.TEXT_COLOR)
+        self.TEXT_COLOR = TEXT_COLOR
+        self.txt_surface = render_text(self.text, self.FONT_STYLE, self.FONT_SIZE, self.TEXT_COLOR)
 
     def handle_event(self, event):
         super().handle_event(event)
@@ -62,7 +121,7 @@ class NumericalInput(BasicInput):
                         int(self.text)
                     except ValueError:
                         self.text = "Numerical input required!"
-                self.txt_surface = self.FONT.render(self.text, True, self.TEXT_COLOR)
+                self.txt_surface = render_text(self.text, self.FONT_STYLE, self.FONT_SIZE, self.TEXT_COLOR)
                 if self.text == "Numerical input required!":
                     self.text = ''
 
@@ -85,16 +144,18 @@ class ToggleButton(BasicInput):
         self.TEXT_INACTIVE = text_inactive
         self.TEXT_ACTIVE = text_active
         self.text = self.TEXT_INACTIVE
-        self.TEXT_COLOR  = pygame.Color(TEXT_COLOR)
-        self.toggle = self.FONT.render(self.text, True, self.TEXT_COLOR)
+        self.TEXT_COLOR = TEXT_COLOR
+        self.toggle = render_text(self.text, self.FONT_STYLE, self.FONT_SIZE, self.TEXT_COLOR)
 
     def handle_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN:
             if self.rect.collidepoint(event.pos):
                 self.active = not self.active
         self.color = self.COLOR_ACTIVE if self.active else self.COLOR_INACTIVE
-        self.text = self.TEXT_ACTIVE if self.active else self.TEXT_INACTIVE
-        self.toggle = self.FONT.render(self.text, True, self.TEXT_COLOR)
+        text = self.TEXT_ACTIVE if self.active else self.TEXT_INACTIVE
+        if text != self.text:
+            self.text = text
+            self.toggle = render_text(self.text, self.FONT_STYLE, self.FONT_SIZE, self.TEXT_COLOR)
 
     def update(self):
         self.rect.w = max(35, self.toggle.get_width() + 20)
@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import numpy as np
+from solver import Engine
+from rules import HeadlessBoard
+from options import parse_value
+
+CORPUS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'positions_v1.json')
+CORPUS_VERSION = 1
+
+# Search depth 0 means a full search, as in model_setup.
+VARIANTS = {
+    'minimax': (0, False, False),
+    'improved_minimax': (0, False, True),
+    'minimax_alpha_beta_pruning': (0, True, False),
+    'improved_minimax_alpha_beta_pruning': (0, True, True),
+    'depth_limited_minimax': (None, False, False),
+    'improved_depth_limited_minimax': (None, False, True),
+    'depth_limited_alpha_beta_pruning': (None, True, False),
+    'improved_depth_limited_alpha_beta_pruning': (None, True, True),
+}
+
+# (SIZE, WIN_SCORE, stones already played, positions, search depth)
+CORPUS_LAYOUT = [
+    (3, 3, 2, 2, 2), (3, 3, 4, 2, 2),
+    (4, 3, 6, 2, 2), (4, 3, 9, 2, 3),
+    (4, 4, 9, 2, 2), (4, 4, 10, 2, 3),
+    (5, 4, 6, 2, 2), (5, 4, 17, 2, 3),
+    (6, 4, 10, 2, 2), (7, 5, 12, 2, 2),
+]
+
+def make_corpus(seed=0):
+    generator = random.Random(seed)
+    positions = []
+    for SIZE, WIN_SCORE, stones, count, depth in CORPUS_LAYOUT:
+        found = 0
+        while found < count:
+            board = HeadlessBoard(SIZE, WIN_SCORE)
+            cells = [(i, j) for i in range(SIZE) for j in range(SIZE)]
+            generator.shuffle(cells)
+            result = 0
+            for x, y in cells[:stones]:
+                result = board.play(x, y)
+                if result != 0:
+                    break
+            if result != 0:
+                continue
+            found += 1
+            positions.append(dict(id=f"{SIZE}x{SIZE}-{WIN_SCORE}-{stones}-{found}",
+                                  size=SIZE, win_score=WIN_SCORE, depth=depth,
+                                  board=encode_board(board.state), last_move=list(board.moves[-1])))
+    return dict(version=CORPUS_VERSION, seed=seed, positions=positions)
+
+def write_corpus(corpus, path=CORPUS_FILE):
+    # One position per line keeps diffs between corpus versions readable.
+    positions = ',\n  '.join(json.dumps(position) for position in corpus['positions'])
+    with open(path, 'w') as corpus_file:
+        corpus_file.write(f'{{"version": {corpus["version"]}, "seed": {corpus["seed"]}, "positions": [\n  {positions}\n]}}\n')
+
+def encode_board(state):
+    symbols = {1: 'x', -1: 'o', 0: '.'}
+    return [''.join(symbols[int(value)] for value in row) for row in state]
+
+def decode_board(rows):
+    values = {'x': 1, 'o': -1, '.': 0}
+    return np.array([[values[symbol] for symbol in row] for row in rows], dtype=float)
+
+def load_corpus(path=CORPUS_FILE):
+    with open(path) as corpus_file:
+        corpus = json.load(corpus_file)
+    if corpus['version'] != CORPUS_VERSION:
+        raise ValueError(f"Corpus {path} is version {corpus['version']}, expected {CORPUS_VERSION}")
+    return corpus
+
+def search_once(position, variant, options):
+    state = decode_board(position['board'])
+    SIZE = position['size']
+    player = 'x' if np.count_nonzero(state == 1) == np.count_nonzero(state == -1) else 'o'
+    search_depth, use_alpha_beta, use_improvement = VARIANTS[variant]
+    if search_depth is None:
+        search_depth = position['depth']
+
+    random.seed(0)
+    engine = Engine(SIZE, position['win_score'], player)
+    engine.model_setup((search_depth, use_alpha_beta, use_improvement, False), **options)
+    engine.state = engine.convert_state(state)
+    engine.current_move = tuple(position['last_move'])
+    engine.first_move = False
+
+    start = time.perf_counter()
+    engine.run()
+    elapsed = time.perf_counter() - start
+    engine.shutdown()
+    return elapsed, engine.nodes, list(engine.current_move)
+
+def run_benchmarks(corpus, variants, options, repeats=3, max_empty=9):
+    results = []
+    for position in corpus['positions']:
+        empty = sum(row.count('.') for row in position['board'])
+        for variant in variants:
+            # Full width searches are exponential in the number of empty
+            # squares, so they are only run on nearly finished positions.
+            if VARIANTS[variant][0] == 0 and empty > max_empty:
+                continue
+            times = []
+            for _ in range(repeats):
+                elapsed, nodes, move = search_once(position, variant, options)
+                times.append(elapsed)
+            # Noise only ever makes a run slower, so the fastest run is the
+            # most repeatable measure of the search itself.
+            seconds = min(times)
+            results.append(dict(position=position['id'], variant=variant, nodes=nodes,
+                                seconds=seconds, nodes_per_second=nodes / seconds if seconds else 0.0,
+                                move=move))
+            print(f"{position['id']:<16}{variant:<44}{nodes:>10}{1000 * seconds:>12.2f} ms  {tuple(move)}",
+                  flush=True)
+    return results
+
+def compare(results, baseline, time_tolerance=0.25, time_floor=0.002):
+    previous = {(result['position'], result['variant']): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        old = previous.get((result['position'], result['variant']))
+        if old is None:
+            continue
+        key = f"{result['position']} {result['variant']}"
+        # Randomisation is off, so node counts and moves are repeatable and
+        # any change in them is real, while times are only compared with
+        # some slack for noise. A search of a fraction of a millisecond can
+        # easily take a quarter longer from one run to the next, so a change
+        # also has to be larger than time_floor seconds to count.
+        if result['nodes'] > old['nodes']:
+            regressions.append(f"{key}: nodes {old['nodes']} -> {result['nodes']}")
+        if result['move'] != old['move']:
+            regressions.append(f"{key}: move {tuple(old['move'])} -> {tuple(result['move'])}")
+        if result['seconds'] > max(old['seconds'] * (1 + time_tolerance), old['seconds'] + time_floor):
+            regressions.append(f"{key}: time {1000 * old['seconds']:.2f} ms -> {1000 * result['seconds']:.2f} ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the search models on a fixed corpus of positions.")
+    parser.add_argument('--corpus', default=CORPUS_FILE)
+    parser.add_argument('--variant', action='append', dest='variants', choices=list(VARIANTS),
+                        help="only run these search variants (default: all)")
+    parser.add_argument('--option', action='append', default=[],
+                        help="model_setup keyword option as name=value, e.g. use_bitboard=1")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--max-empty', type=int, default=9,
+                        help="skip full width searches on positions with more empty squares")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--baseline', help="compare against a previous --output file")
+    parser.add_argument('--time-tolerance', type=float, default=0.25)
+    parser.add_argument('--time-floor', type=float, default=0.002,
+                        help="seconds a search must slow down by, on top of the tolerance, to count as a regression")
+    parser.add_argument('--write-corpus', action='store_true',
+                        help="regenerate the corpus file instead of benchmarking")
+    arguments = parser.parse_args()
+
+    if arguments.write_corpus:
+        write_corpus(make_corpus(), arguments.corpus)
+        return
+
+    options = {}
+    for option in arguments.option:
+        key, _, value = option.partition('=')
+        options[key] = parse_value(value)
+
+    corpus = load_corpus(arguments.corpus)
+    results = run_benchmarks(corpus, arguments.variants or list(VARIANTS), options,
+                             arguments.repeats, arguments.max_empty)
+    report = dict(corpus_version=corpus['version'], options=options, repeats=arguments.repeats,
+                  python=platform.python_version(), numpy=np.__version__, results=results)
+    if arguments.output:
+        with open(arguments.output, 'w') as output:
+            json.dump(report, output, indent=1)
+
+    if arguments.baseline:
+        with open(arguments.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, arguments.time_tolerance, arguments.time_floor)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        print(f"{len(regressions)} regressions against {arguments.baseline}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import numpy as np
+from functools import lru_cache
+from rules import board_square
+
+# Directions in the order board_traversal_heuristic walks them: the four
+# "left" rays followed by their opposite "right" rays.
+RAY_DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1),
+                  (0, -1), (-1, 0), (-1, -1), (-1, 1))
+
+@lru_cache(maxsize=None)
+def board_geometry(SIZE, WIN_SCORE):
+    STRIDE = SIZE + 1
+    full = 0
+    rays = []
+    for i in range(SIZE):
+        full |= (1 << (i * STRIDE)) * ((1 << SIZE) - 1)
+        row = []
+        for j in range(SIZE):
+            steps = []
+            for k in range(1, WIN_SCORE):
+                step = []
+                for dx, dy in RAY_DIRECTIONS:
+                    x, y = i + k * dx, j + k * dy
+                    step.append(1 << (x * STRIDE + y) if 0 <= x < SIZE and 0 <= y < SIZE else 0)
+                steps.append(tuple(step))
+            row.append(tuple(steps))
+        rays.append(tuple(row))
+    return full, tuple(rays)
+
+class BitBoard:
+    def __init__(self, SIZE, WIN_SCORE):
+        self.SIZE = SIZE
+        self.WIN_SCORE = WIN_SCORE
+        # Every row carries one spare, always empty, bit so that shifted
+        # lines can never wrap around from one row onto the next.
+        self.STRIDE = self.SIZE + 1
+        self.SHIFTS = (1, self.STRIDE, self.STRIDE + 1, self.STRIDE - 1)
+        self.FULL, self.RAYS = board_geometry(self.SIZE, self.WIN_SCORE)
+        self.x_bits = 0
+        self.o_bits = 0
+
+    def bit(self, x, y):
+        x, y = board_square(x, y, self.SIZE)
+        return 1 << (x * self.STRIDE + y)
+
+    def __getitem__(self, index):
+        bit = self.bit(*index)
+        if self.x_bits & bit:
+            return 1
+        elif self.o_bits & bit:
+            return -1
+        return 0
+
+    def __setitem__(self, index, value):
+        bit = self.bit(*index)
+        if value > 0:
+            self.x_bits |= bit
+            self.o_bits &= ~bit
+        elif value < 0:
+            self.o_bits |= bit
+            self.x_bits &= ~bit
+        else:
+            self.x_bits &= ~bit
+            self.o_bits &= ~bit
+
+    def copy(self):
+        board = BitBoard(self.SIZE, self.WIN_SCORE)
+        board.x_bits = self.x_bits
+        board.o_bits = self.o_bits
+        return board
+
+    def empty_cells(self):
+        cells = []
+        empty = self.FULL & ~(self.x_bits | self.o_bits)
+        while empty:
+            low = empty & -empty
+            x, y = divmod(low.bit_length() - 1, self.STRIDE)
+            cells.append((x, y))
+            empty ^= low
+        return cells
+
+    def has_line(self, bits):
+        for shift in self.SHIFTS:
+            line = bits
+            length = 1
+            while length < self.WIN_SCORE and line:
+                step = min(length, self.WIN_SCORE - length)
+                line &= line >> (step * shift)
+                length += step
+            if line:
+                return True
+        return False
+
+    def winner(self):
+        if self.has_line(self.x_bits):
+            return 1 # X Wins
+        elif self.has_line(self.o_bits):
+            return -1 # O Wins
+        return 0
+
+    def to_array(self):
+        state = np.zeros((self.SIZE, self.SIZE))
+        for i in range(self.SIZE):
+            for j in range(self.SIZE):
+                state[i, j] = self[i, j]
+        return state
+
+    @classmethod
+    def from_array(cls, state, WIN_SCORE):
+        SIZE = len(state)
+        board = cls(SIZE, WIN_SCORE)
+        for i in range(SIZE):
+            for j in range(SIZE):
+                if state[i][j] != 0:
+                    board[i, j] = state[i][j]
+        return board
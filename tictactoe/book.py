@@ -0,0 +1,142 @@
+import argparse
+import mmap
+import struct
+import time
+import numpy as np
+from functools import lru_cache
+from evaluator import evaluate_boards
+from transposition import SymmetricZobristHash
+from options import parse_value
+
+MAGIC = b'TTOB'
+VERSION = 1
+HEADER = struct.Struct('<4sBBBBI4x')
+
+def default_path(SIZE, WIN_SCORE):
+    return f"opening_book_{SIZE}x{SIZE}_{WIN_SCORE}.bin"
+
+def side_to_move(state):
+    return 'x' if np.count_nonzero(state == 1) == np.count_nonzero(state == -1) else 'o'
+
+def build_book(SIZE, WIN_SCORE, plies, configuration, options, path=None, verbose=False):
+    from solver import Engine
+    path = path or default_path(SIZE, WIN_SCORE)
+    zobrist = SymmetricZobristHash(SIZE)
+    engines = {}
+    for player in ('x', 'o'):
+        engines[player] = Engine(SIZE, WIN_SCORE, player)
+        engines[player].model_setup(configuration, **options)
+    book = {}
+    start = time.perf_counter()
+
+    # The book only has to answer the positions it can lead to: the book
+    # side always plays its book move, and every reply of the other side is
+    # followed, once for each mirror image class.
+    for side in ('x', 'o'):
+        frontier = [(np.zeros((SIZE, SIZE)), (-1, -1))]
+        for ply in range(plies):
+            player = 'x' if ply % 2 == 0 else 'o'
+            value = 1 if player == 'x' else -1
+            children = []
+            seen = set()
+            for state, last_move in frontier:
+                key, symmetry = zobrist.canonical(zobrist.hash_states(state, player))
+                if player == side:
+                    if key not in book:
+                        book[key] = search_move(engines[player], state, last_move, zobrist, symmetry)
+                        if verbose:
+                            print(f"{len(book)} positions, {time.perf_counter() - start:.1f}s", flush=True)
+                    moves = [zobrist.from_canonical(book[key], symmetry)]
+                else:
+                    moves = [(i, j) for i in range(SIZE) for j in range(SIZE) if state[i, j] == 0]
+                for x, y in moves:
+                    child = state.copy()
+                    child[x, y] = value
+                    child_key, _ = zobrist.canonical(zobrist.hash_states(child, 'o' if player == 'x' else 'x'))
+                    if child_key in seen or evaluate_boards(child, WIN_SCORE)[1][0]:
+                        continue
+                    seen.add(child_key)
+                    children.append((child, (x, y)))
+            frontier = children
+
+    write_book(book, SIZE, WIN_SCORE, plies, path)
+    for engine in engines.values():
+        engine.shutdown()
+    return path
+
+def search_move(engine, state, last_move, zobrist, symmetry):
+    engine.reset()
+    engine.state = engine.convert_state(state.copy())
+    engine.current_move = last_move
+    engine.first_move = False
+    engine.run()
+    return zobrist.to_canonical(engine.current_move, symmetry)
+
+def write_book(book, SIZE, WIN_SCORE, plies, path):
+    keys = np.array(sorted(book), dtype=np.uint64)
+    moves = np.array([book[int(key)][0] * SIZE + book[int(key)][1] for key in keys], dtype=np.uint8)
+    with open(path, 'wb') as output:
+        output.write(HEADER.pack(MAGIC, VERSION, SIZE, WIN_SCORE, plies, len(keys)))
+        output.write(keys.tobytes())
+        output.write(moves.tobytes())
+
+class OpeningBook:
+    # Sorted position keys followed by one byte per move, searched with a
+    # binary search. Nothing is read until the first lookup.
+    def __init__(self, path):
+        self.path = path
+        self.memory = None
+
+    def load(self):
+        with open(self.path, 'rb') as book_file:
+            magic, version, self.SIZE, self.WIN_SCORE, self.plies, count = HEADER.unpack(
+                book_file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{self.path} is not a version {VERSION} opening book")
+            self.memory = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.keys = np.frombuffer(self.memory, dtype=np.uint64, count=count, offset=HEADER.size)
+        self.moves = np.frombuffer(self.memory, dtype=np.uint8, count=count, offset=HEADER.size + 8 * count)
+        self.zobrist = SymmetricZobristHash(self.SIZE)
+
+    def probe(self, state):
+        if self.memory is None:
+            self.load()
+        if not isinstance(state, np.ndarray):
+            state = state.to_array()
+        if np.count_nonzero(state) >= self.plies:
+            return None
+        key, symmetry = self.zobrist.canonical(self.zobrist.hash_states(state, side_to_move(state)))
+        index = int(np.searchsorted(self.keys, np.uint64(key)))
+        if index == len(self.keys) or int(self.keys[index]) != key:
+            return None
+        move = divmod(int(self.moves[index]), self.SIZE)
+        return self.zobrist.from_canonical(move, symmetry)
+
+@lru_cache(maxsize=None)
+def open_book(path):
+    return OpeningBook(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an opening book by deep search.")
+    parser.add_argument('--size', type=int, default=5)
+    parser.add_argument('--win-score', type=int, default=4)
+    parser.add_argument('--plies', type=int, default=4, help="number of moves from the start the book covers")
+    parser.add_argument('--depth', type=int, default=0, help="search depth limit, 0 for none")
+    parser.add_argument('--time-budget', type=float, default=2.0, help="seconds of search per book position")
+    parser.add_argument('--option', action='append', default=[],
+                        help="extra model_setup keyword option as name=value")
+    parser.add_argument('--output', help="defaults to opening_book_<size>x<size>_<win score>.bin")
+    arguments = parser.parse_args()
+
+    options = dict(use_transposition_table=True, use_move_ordering=True, use_symmetry=True,
+                   time_budget=arguments.time_budget)
+    for option in arguments.option:
+        key, _, value = option.partition('=')
+        options[key] = parse_value(value)
+    start = time.perf_counter()
+    path = build_book(arguments.size, arguments.win_score, arguments.plies,
+                      (arguments.depth, True, False, False), options, arguments.output, verbose=True)
+    print(f"Wrote {path} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+import numpy as np
+
+def window_counts(stones, WIN_SCORE):
+    # stones is an (N, SIZE, SIZE) array of 0/1 flags. Each direction is
+    # summed as WIN_SCORE shifted slices of the whole stack, so the cost is
+    # a handful of array additions whatever N and SIZE are.
+    SIZE = stones.shape[1]
+    span = SIZE - WIN_SCORE + 1
+    if span <= 0:
+        return [np.zeros((len(stones), 0), dtype=stones.dtype)]
+    vertical = sum(stones[:, :, k:k + span] for k in range(WIN_SCORE))
+    horizontal = sum(stones[:, k:k + span, :] for k in range(WIN_SCORE))
+    diagonal = sum(stones[:, k:k + span, k:k + span] for k in range(WIN_SCORE))
+    off_diagonal = sum(stones[:, k:k + span, WIN_SCORE - 1 - k:WIN_SCORE - 1 - k + span]
+                       for k in range(WIN_SCORE))
+    return [counts.reshape(len(stones), -1)
+            for counts in (vertical, horizontal, diagonal, off_diagonal)]
+
+def evaluate_boards(boards, WIN_SCORE):
+    boards = np.asarray(boards)
+    if boards.ndim == 2:
+        boards = boards[None]
+    x_counts = np.concatenate(window_counts((boards == 1).astype(np.int32), WIN_SCORE), axis=1)
+    o_counts = np.concatenate(window_counts((boards == -1).astype(np.int32), WIN_SCORE), axis=1)
+
+    # Every window still open to one player is worth the square of that
+    # player's stones in it, positive for X and negative for O.
+    x_open = np.where(o_counts == 0, x_counts ** 2, 0).sum(axis=1)
+    o_open = np.where(x_counts == 0, o_counts ** 2, 0).sum(axis=1)
+    values = (x_open - o_open).astype(float)
+
+    x_wins = (x_counts == WIN_SCORE).any(axis=1)
+    o_wins = (o_counts == WIN_SCORE).any(axis=1)
+    full = (boards != 0).all(axis=(1, 2))
+    values[full] = 0
+    values[x_wins] = np.inf
+    values[o_wins & ~x_wins] = -np.inf
+    terminal = x_wins | o_wins | full
+    return values, terminal
@@ -0,0 +1,61 @@
+from sparse import SparseBoard
+
+class Frontier:
+    # The empty squares within radius of a stone, kept up to date as stones
+    # are added and removed, so the search never has to scan the board for
+    # its moves.
+    def __init__(self, SIZE, radius=2):
+        self.SIZE = SIZE
+        self.radius = radius
+        self.clear()
+
+    def clear(self):
+        # How many stones are within radius of each square, for the squares
+        # near at least one, so nothing here grows with the board.
+        self.near = {}
+        self.occupied = set()
+        self.cells = set()
+
+    def load(self, state):
+        self.clear()
+        if isinstance(state, SparseBoard):
+            for i, j in state.cells:
+                self.add(i, j)
+            return
+        for i in range(self.SIZE):
+            for j in range(self.SIZE):
+                if state[i, j] != 0:
+                    self.add(i, j)
+
+    def neighbours(self, x, y):
+        # The squares within radius king moves of (x, y), itself included.
+        rows = range(max(0, x - self.radius), min(self.SIZE, x + self.radius + 1))
+        columns = range(max(0, y - self.radius), min(self.SIZE, y + self.radius + 1))
+        return [(i, j) for i in rows for j in columns]
+
+    def add(self, x, y):
+        near = self.near
+        self.occupied.add((x, y))
+        self.cells.discard((x, y))
+        for square in self.neighbours(x, y):
+            count = near.get(square, 0) + 1
+            near[square] = count
+            if count == 1 and square not in self.occupied:
+                self.cells.add(square)
+
+    def remove(self, x, y):
+        near = self.near
+        self.occupied.discard((x, y))
+        for square in self.neighbours(x, y):
+            count = near[square] - 1
+            if count == 0:
+                del near[square]
+                self.cells.discard(square)
+            else:
+                near[square] = count
+        if (x, y) in near:
+            self.cells.add((x, y))
+
+    def actions(self):
+        # In row major order, the order a scan of the board gives.
+        return sorted(self.cells)
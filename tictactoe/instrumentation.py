@@ -0,0 +1,139 @@
+import json
+import time
+
+class SearchStats:
+    def __init__(self, move_number, player, model):
+        self.move_number = move_number
+        self.player = player
+        self.model = model
+        self.move = None
+        self.nodes = 0
+        self.goal_tests = 0
+        self.evaluations = 0
+        self.nodes_per_ply = []
+        self.cutoffs_per_ply = []
+        self.max_depth = 0
+        self.completed_depth = 0
+        self.wall_time = 0.0
+
+    def effective_branching_factor(self):
+        # The branching factor b of a uniform tree of max_depth plies with
+        # the same number of nodes, so that nodes = b ** max_depth.
+        if self.max_depth == 0 or self.nodes <= 1:
+            return 0.0
+        return self.nodes ** (1 / self.max_depth)
+
+    def cutoffs(self):
+        return sum(self.cutoffs_per_ply)
+
+    def as_dict(self):
+        return dict(move_number=self.move_number, player=self.player, model=self.model,
+                    move=self.move, nodes=self.nodes, goal_tests=self.goal_tests,
+                    evaluations=self.evaluations, nodes_per_ply=self.nodes_per_ply,
+                    cutoffs=self.cutoffs(), cutoffs_per_ply=self.cutoffs_per_ply,
+                    max_depth=self.max_depth, completed_depth=self.completed_depth,
+                    effective_branching_factor=self.effective_branching_factor(),
+                    wall_time=self.wall_time,
+                    nodes_per_second=self.nodes / self.wall_time if self.wall_time else 0.0)
+
+# The counters are installed as instance attributes that shadow the Engine
+# methods they wrap, and removed again when instrumentation is turned off,
+# so an engine without instrumentation runs exactly the code it did before.
+WRAPPED_METHODS = ('run', 'visit_node', 'goal_test', 'evaluation_heuristic',
+                   'make_move', 'unmake_move', 'record_cutoff')
+
+class Instrumentation:
+    def __init__(self, engine, trace=None):
+        self.engine = engine
+        self.trace = trace
+        self.trace_file = None
+        self.stats = None
+        self.history = []
+        self.move_number = 0
+        self.ply = 0
+
+    def install(self):
+        engine = self.engine
+        for name in WRAPPED_METHODS:
+            original = getattr(type(engine), name).__get__(engine)
+            setattr(engine, name, getattr(self, 'wrap_' + name)(original))
+
+    def uninstall(self):
+        for name in WRAPPED_METHODS:
+            self.engine.__dict__.pop(name, None)
+        self.close()
+
+    def close(self):
+        if self.trace_file is not None and self.trace_file is not self.trace:
+            self.trace_file.close()
+        self.trace_file = None
+
+    def write_trace(self, stats):
+        if self.trace is None:
+            return
+        if self.trace_file is None:
+            self.trace_file = open(self.trace, 'a') if isinstance(self.trace, str) else self.trace
+        self.trace_file.write(json.dumps(stats.as_dict()) + '\n')
+        self.trace_file.flush()
+
+    def count_ply(self, counts):
+        while len(counts) <= self.ply:
+            counts.append(0)
+        counts[self.ply] += 1
+
+    def wrap_run(self, run):
+        def instrumented_run():
+            engine = self.engine
+            self.move_number += 1
+            self.ply = 0
+            self.stats = SearchStats(self.move_number, engine.player, engine.model.__name__)
+            start = time.perf_counter()
+            try:
+                run()
+            finally:
+                stats = self.stats
+                stats.wall_time = time.perf_counter() - start
+                stats.nodes = engine.nodes
+                stats.completed_depth = engine.completed_depth
+                stats.move = list(engine.current_move)
+                self.history.append(stats)
+                self.write_trace(stats)
+        return instrumented_run
+
+    def wrap_visit_node(self, visit_node):
+        def instrumented_visit_node():
+            self.count_ply(self.stats.nodes_per_ply)
+            visit_node()
+        return instrumented_visit_node
+
+    def wrap_goal_test(self, goal_test):
+        def instrumented_goal_test(state):
+            self.stats.goal_tests += 1
+            return goal_test(state)
+        return instrumented_goal_test
+
+    def wrap_evaluation_heuristic(self, evaluation_heuristic):
+        def instrumented_evaluation_heuristic(state, player):
+            self.stats.evaluations += 1
+            return evaluation_heuristic(state, player)
+        return instrumented_evaluation_heuristic
+
+    def wrap_make_move(self, make_move):
+        def instrumented_make_move(state, action, value):
+            self.ply += 1
+            if self.ply > self.stats.max_depth:
+                self.stats.max_depth = self.ply
+            make_move(state, action, value)
+        return instrumented_make_move
+
+    def wrap_unmake_move(self, unmake_move):
+        def instrumented_unmake_move(state, action, value):
+            self.ply -= 1
+            unmake_move(state, action, value)
+        return instrumented_unmake_move
+
+    def wrap_record_cutoff(self, record_cutoff):
+        def instrumented_record_cutoff(action, depth, move_index):
+            self.count_ply(self.stats.cutoffs_per_ply)
+            record_cutoff(action, depth, move_index)
+        return instrumented_record_cutoff
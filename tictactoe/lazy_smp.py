@@ -0,0 +1,83 @@
+import multiprocessing
+import random
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from solver import Engine
+from transposition import SharedTranspositionTable
+
+# Per helper process state, set up once by init_helper.
+stop_event = None
+shared_table = None
+helper_engines = {}
+
+def init_helper(event, SIZE, table_size, table_name, seed):
+    global stop_event, shared_table
+    stop_event = event
+    shared_table = SharedTranspositionTable(SIZE, table_size, name=table_name)
+    random.seed(seed + multiprocessing.current_process().pid)
+
+def helper_engine(SIZE, WIN_SCORE, player, configuration, options):
+    key = (SIZE, WIN_SCORE, player, configuration, tuple(sorted(options.items())))
+    if key not in helper_engines:
+        engine = Engine(SIZE, WIN_SCORE, player)
+        # Helpers break move ordering ties at random, so each of them walks
+        # the tree in a slightly different order and fills different parts
+        # of the shared table.
+        search_depth, use_alpha_beta, use_improvement, _ = configuration
+        engine.model_setup((search_depth, use_alpha_beta, use_improvement, True), **options)
+        engine.transposition_table = shared_table
+        engine.stop_event = stop_event
+        helper_engines[key] = engine
+    return helper_engines[key]
+
+def helper_search(task):
+    (SIZE, WIN_SCORE, player, configuration, options, state, current_move,
+     time_budget, node_budget, generation, start_depth) = task
+    engine = helper_engine(SIZE, WIN_SCORE, player, configuration, options)
+    engine.state = engine.convert_state(state)
+    engine.current_move = current_move
+    engine.time_budget = time_budget
+    engine.node_budget = node_budget
+    engine.begin_search()
+    shared_table.generation = generation
+    engine.start_depth = start_depth
+    best_move = engine.iterative_deepening()
+    return engine.completed_depth, best_move, engine.nodes
+
+class LazySMPSearch:
+    def __init__(self, SIZE, workers, table_size, seed=0):
+        self.workers = workers
+        self.table = SharedTranspositionTable(SIZE, table_size)
+        self.stop_event = multiprocessing.Event()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers - 1, initializer=init_helper,
+                                        initargs=(self.stop_event, SIZE, table_size,
+                                                  self.table.name, seed))
+
+    def search(self, engine, configuration, options):
+        self.stop_event.clear()
+        state = engine.state if isinstance(engine.state, np.ndarray) else engine.state.to_array()
+        # Every other helper starts one ply deeper, so that the helpers are
+        # not all working on the same iteration at the same time.
+        tasks = [(engine.SIZE, engine.WIN_SCORE, engine.player, configuration, options,
+                  state, engine.current_move, engine.time_budget, engine.node_budget,
+                  self.table.generation, 1 + helper % 2)
+                 for helper in range(1, self.workers)]
+        futures = [self.pool.submit(helper_search, task) for task in tasks]
+
+        best_move = engine.iterative_deepening()
+        best_depth = engine.completed_depth
+        self.stop_event.set()
+
+        nodes = engine.nodes
+        for future in futures:
+            depth, move, helper_nodes = future.result()
+            nodes += helper_nodes
+            if depth > best_depth and move != (-1, -1):
+                best_depth = depth
+                best_move = move
+        return best_move, best_depth, nodes
+
+    def shutdown(self):
+        self.stop_event.set()
+        self.pool.shutdown()
+        self.table.close()
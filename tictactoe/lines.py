@@ -0,0 +1,93 @@
+from functools import lru_cache
+
+LINE_DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+@lru_cache(maxsize=None)
+def line_windows(SIZE, WIN_SCORE):
+    windows = []
+    cell_windows = [[[] for _ in range(SIZE)] for _ in range(SIZE)]
+    for dx, dy in LINE_DIRECTIONS:
+        for i in range(SIZE):
+            for j in range(SIZE):
+                end_x = i + (WIN_SCORE - 1) * dx
+                end_y = j + (WIN_SCORE - 1) * dy
+                if not (0 <= end_x < SIZE and 0 <= end_y < SIZE):
+                    continue
+                cells = tuple((i + k * dx, j + k * dy) for k in range(WIN_SCORE))
+                for x, y in cells:
+                    cell_windows[x][y].append(len(windows))
+                windows.append(cells)
+    cell_windows = tuple(tuple(tuple(row) for row in column) for column in cell_windows)
+    return tuple(windows), cell_windows
+
+class LineCounter:
+    def __init__(self, SIZE, WIN_SCORE):
+        self.SIZE = SIZE
+        self.WIN_SCORE = WIN_SCORE
+        self.windows, self.cell_windows = line_windows(self.SIZE, self.WIN_SCORE)
+        self.clear()
+
+    def clear(self):
+        self.x_counts = [0] * len(self.windows)
+        self.o_counts = [0] * len(self.windows)
+        self.x_lines = 0
+        self.o_lines = 0
+        # Moves are only added to the counts when a win is asked for, so the
+        # leaves of a depth limited search, which are never goal tested, only
+        # cost a push and a pop.
+        self.moves = []
+        self.applied = 0
+
+    def load(self, state):
+        self.clear()
+        for i in range(self.SIZE):
+            for j in range(self.SIZE):
+                if state[i, j] != 0:
+                    self.add(i, j, state[i, j])
+
+    def add(self, x, y, value):
+        if value > 0:
+            counts = self.x_counts
+            for window in self.cell_windows[x][y]:
+                counts[window] += 1
+                if counts[window] == self.WIN_SCORE:
+                    self.x_lines += 1
+        else:
+            counts = self.o_counts
+            for window in self.cell_windows[x][y]:
+                counts[window] += 1
+                if counts[window] == self.WIN_SCORE:
+                    self.o_lines += 1
+
+    def remove(self, x, y, value):
+        if value > 0:
+            counts = self.x_counts
+            for window in self.cell_windows[x][y]:
+                if counts[window] == self.WIN_SCORE:
+                    self.x_lines -= 1
+                counts[window] -= 1
+        else:
+            counts = self.o_counts
+            for window in self.cell_windows[x][y]:
+                if counts[window] == self.WIN_SCORE:
+                    self.o_lines -= 1
+                counts[window] -= 1
+
+    def push(self, x, y, value):
+        self.moves.append((x, y, value))
+
+    def pop(self):
+        x, y, value = self.moves.pop()
+        if self.applied > len(self.moves):
+            self.applied -= 1
+            self.remove(x, y, value)
+
+    def winner(self):
+        while self.applied < len(self.moves):
+            self.add(*self.moves[self.applied])
+            self.applied += 1
+        if self.x_lines:
+            return 1 # X Wins
+        elif self.o_lines:
+            return -1 # O Wins
+        return 0
@@ -0,0 +1,170 @@
+import math
+import random
+import time
+import numpy as np
+from lines import LineCounter
+
+class TreeNode:
+    def __init__(self, move=None, value=0, parent=None):
+        self.move = move
+        # The stone of the player who made move, and whose point of view
+        # wins is counted from.
+        self.value = value
+        self.parent = parent
+        self.children = {}
+        self.untried = None
+        self.visits = 0
+        self.wins = 0.0
+        self.result = None
+
+    def select_child(self, exploration):
+        log_visits = math.log(self.visits)
+        return max(self.children.values(),
+                   key=lambda child: child.wins / child.visits
+                   + exploration * math.sqrt(log_visits / child.visits))
+
+class MonteCarloTreeSearch:
+    def __init__(self, SIZE, WIN_SCORE, exploration=1.0, batch_size=32, radius=2):
+        self.SIZE = SIZE
+        self.WIN_SCORE = WIN_SCORE
+        self.exploration = exploration
+        self.batch_size = batch_size
+        self.radius = radius
+        self.lines = LineCounter(self.SIZE, self.WIN_SCORE)
+        self.windows = np.array([[x * self.SIZE + y for x, y in cells] for cells in self.lines.windows],
+                                dtype=np.intp).reshape(-1, self.WIN_SCORE)
+        self.generator = np.random.default_rng(random.getrandbits(32))
+        self.clear()
+
+    def clear(self):
+        self.root = None
+        self.root_state = None
+        self.playouts = 0
+
+    def candidate_moves(self, state):
+        # Only squares near a stone are worth expanding in the tree, the
+        # playouts still use the whole board.
+        stones = np.argwhere(state != 0)
+        if len(stones) == 0:
+            return [(self.SIZE // 2, self.SIZE // 2)]
+        near = np.zeros(state.shape, dtype=bool)
+        for x, y in stones:
+            near[max(0, x - self.radius):x + self.radius + 1, max(0, y - self.radius):y + self.radius + 1] = True
+        moves = np.argwhere(near & (state == 0))
+        if len(moves) == 0:
+            moves = np.argwhere(state == 0)
+        return [(int(x), int(y)) for x, y in moves]
+
+    def reuse_tree(self, state):
+        # Walk down the old tree along the moves played since the last
+        # search, keeping the statistics already gathered below them.
+        if self.root is None or self.root_state.shape != state.shape:
+            return None
+        played = np.argwhere((self.root_state == 0) & (state != 0))
+        if np.any((self.root_state != 0) & (self.root_state != state)):
+            return None
+        node = self.root
+        remaining = {(int(x), int(y)) for x, y in played}
+        while remaining:
+            for move in remaining:
+                child = node.children.get(move)
+                if child is not None and child.value == state[move]:
+                    node = child
+                    remaining.discard(move)
+                    break
+            else:
+                return None
+        node.parent = None
+        return node
+
+    def simulate(self, board, to_move, count):
+        # Each playout fills the empty squares in a random order, alternating
+        # players. A window is won at the time its last square is filled if
+        # every stone in it is one player's, and the playout goes to whoever
+        # completes a window first, or is a draw if nobody does.
+        empty = np.flatnonzero(board == 0)
+        order = self.generator.random((count, len(empty))).argsort(axis=1)
+        rows = np.arange(count)[:, None]
+        steps = np.arange(len(empty))
+        times = np.full((count, board.size), -1)
+        owners = np.repeat(board[None], count, axis=0)
+        times[rows, empty[order]] = steps
+        owners[rows, empty[order]] = np.where(steps % 2 == 0, to_move, -to_move)
+
+        window_owners = owners[:, self.windows]
+        finished = times[:, self.windows].max(axis=2)
+        never = board.size
+        x_time = np.where((window_owners == 1).all(axis=2), finished, never).min(axis=1)
+        o_time = np.where((window_owners == -1).all(axis=2), finished, never).min(axis=1)
+        return np.where(x_time < o_time, 1, np.where(o_time < x_time, -1, 0))
+
+    def search(self, state, player, time_budget=None, playout_budget=None, stop_event=None):
+        state = np.array(state, dtype=np.int8)
+        self.root = self.reuse_tree(state) or TreeNode(value=-1 if player == 'x' else 1)
+        self.root_state = state.copy()
+        self.lines.load(state)
+        self.playouts = 0
+        deadline = time.perf_counter() + time_budget if time_budget is not None else np.inf
+        if time_budget is None and playout_budget is None:
+            playout_budget = 2000
+
+        # The root is always expanded at least once, so that a budget that
+        # has already run out still leaves a move to play.
+        while not self.root.children or \
+              (time.perf_counter() < deadline and (playout_budget is None or self.playouts < playout_budget)):
+            if stop_event is not None and stop_event.is_set() and self.root.children:
+                break
+            node = self.root
+            path = [node]
+            played = []
+
+            # Selection and expansion.
+            while node.result is None:
+                if node.untried is None:
+                    node.untried = self.candidate_moves(state)
+                    random.shuffle(node.untried)
+                if node.untried:
+                    move = node.untried.pop()
+                    child = TreeNode(move, -node.value, node)
+                    node.children[move] = child
+                    self.play(state, move, child.value, played)
+                    child.result = self.terminal_result(state)
+                    node = child
+                    path.append(node)
+                    break
+                node = node.select_child(self.exploration)
+                self.play(state, node.move, node.value, played)
+                path.append(node)
+
+            # Simulation, a batch of playouts at once from the new leaf.
+            count = self.batch_size
+            if node.result is not None:
+                results = np.full(count, node.result)
+            else:
+                results = self.simulate(state.reshape(-1), -node.value, count)
+            self.playouts += count
+
+            wins = {1: float(np.count_nonzero(results == 1)), -1: float(np.count_nonzero(results == -1))}
+            draws = count - wins[1] - wins[-1]
+            for visited in path:
+                visited.visits += count
+                visited.wins += wins[visited.value] + 0.5 * draws
+
+            for move, value in reversed(played):
+                state[move] = 0
+                self.lines.remove(move[0], move[1], value)
+
+        return max(self.root.children.values(), key=lambda child: child.visits).move
+
+    def play(self, state, move, value, played):
+        state[move] = value
+        self.lines.add(move[0], move[1], value)
+        played.append((move, value))
+
+    def terminal_result(self, state):
+        winner = self.lines.winner()
+        if winner != 0:
+            return winner
+        if not np.any(state == 0):
+            return 0
+        return None
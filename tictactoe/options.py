@@ -0,0 +1,13 @@
+# Turns the value of a name=value option given on the command line into
+# the number or flag model_setup expects.
+def parse_value(value):
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    if value in ('True', 'true'):
+        return True
+    if value in ('False', 'false'):
+        return False
+    return value
@@ -0,0 +1,70 @@
+import random
+
+class MoveOrdering:
+    def __init__(self, SIZE, randomize=True, killer_slots=2):
+        self.SIZE = SIZE
+        self.randomize = randomize
+        self.killer_slots = killer_slots
+        self.killers = []
+        # History scores of the squares that have any, so that a large
+        # board costs nothing for the squares never searched.
+        self.history = {}
+        self.reset_statistics()
+
+    def reset(self):
+        self.killers = []
+        self.history = {}
+        self.reset_statistics()
+
+    def reset_statistics(self):
+        self.searched_nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def new_search(self):
+        # History scores from earlier moves stay useful but should not
+        # outweigh what is learnt in the current search.
+        self.history = {action: score // 2 for action, score in self.history.items() if score > 1}
+        self.killers = []
+
+    def killers_at(self, ply):
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        return self.killers[ply]
+
+    def order(self, actions, ply, best_move=None):
+        self.searched_nodes += 1
+        killers = self.killers_at(ply)
+        keys = {}
+        for action in actions:
+            if action == best_move:
+                score = 3
+            elif action in killers:
+                score = 2
+            else:
+                score = 1
+            tie_breaker = random.random() if self.randomize else 0
+            keys[action] = (score, self.history.get(action, 0), tie_breaker)
+        return sorted(actions, key=keys.__getitem__, reverse=True)
+
+    def record_cutoff(self, action, ply, depth, move_index):
+        self.cutoffs += 1
+        if move_index == 0:
+            self.first_move_cutoffs += 1
+
+        killers = self.killers_at(ply)
+        if action not in killers:
+            killers.insert(0, action)
+            del killers[self.killer_slots:]
+
+        self.history[action] = self.history.get(action, 0) + depth * depth
+
+    def cutoff_rate(self):
+        if self.searched_nodes == 0:
+            return 0
+        return self.cutoffs / self.searched_nodes
+
+    def first_move_cutoff_rate(self):
+        if self.cutoffs == 0:
+            return 0
+        return self.first_move_cutoffs / self.cutoffs
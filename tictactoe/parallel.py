@@ -0,0 +1,113 @@
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from solver import Engine
+
+# Per worker process state, set up once by init_worker and reused for every
+# root action the process is handed.
+shared_bound = None
+worker_engines = {}
+
+def init_worker(bound):
+    global shared_bound
+    shared_bound = bound
+
+def worker_engine(SIZE, WIN_SCORE, player, configuration, options):
+    key = (SIZE, WIN_SCORE, player, configuration, tuple(sorted(options.items())))
+    if key not in worker_engines:
+        engine = Engine(SIZE, WIN_SCORE, player)
+        engine.model_setup(configuration, **options)
+        worker_engines[key] = engine
+    return worker_engines[key]
+
+def read_window(maximising, index):
+    lock, best_value, best_index = shared_bound
+    with lock:
+        value = best_value.value
+        leader = best_index.value
+    # A root action ahead of the current leader in move order wins a tie, so
+    # it may only be cut off if it is strictly worse than the leader.
+    if maximising:
+        alpha = value if index > leader else np.nextafter(value, -np.inf)
+        return alpha, np.inf
+    beta = value if index > leader else np.nextafter(value, np.inf)
+    return -np.inf, beta
+
+def publish(maximising, index, value):
+    lock, best_value, best_index = shared_bound
+    with lock:
+        better = value > best_value.value if maximising else value < best_value.value
+        if better or (value == best_value.value and index < best_index.value):
+            best_value.value = value
+            best_index.value = index
+
+def search_root_action(task):
+    SIZE, WIN_SCORE, player, configuration, options, state, current_move, action, index = task
+    engine = worker_engine(SIZE, WIN_SCORE, player, configuration, options)
+    engine.state = engine.convert_state(state)
+    engine.current_move = current_move
+    engine.begin_search()
+
+    search_depth, use_alpha_beta, _, _ = configuration
+    maximising = player == 'x'
+    opponent = 'o' if maximising else 'x'
+    alpha, beta = read_window(maximising, index) if use_alpha_beta else (-np.inf, np.inf)
+
+    engine.search_root_depth = search_depth
+    engine.make_move(engine.state, action, 1 if maximising else -1)
+    if search_depth == 0:
+        if use_alpha_beta:
+            _, value = engine.minimax_alpha_beta_pruning(engine.state, opponent, alpha, beta)
+        else:
+            _, value = engine.minimax(engine.state, opponent)
+    else:
+        if use_alpha_beta:
+            _, value = engine.depth_limited_alpha_beta_pruning(engine.state, opponent, search_depth - 1, alpha, beta)
+        else:
+            _, value = engine.depth_limited_minimax(engine.state, opponent, search_depth - 1)
+    engine.unmake_move(engine.state, action, 1 if maximising else -1)
+
+    # Only a value that beats the root bound is exact; anything else is a
+    # bound that already loses to the leader.
+    exact = value > alpha if maximising else value < beta
+    if exact and use_alpha_beta:
+        publish(maximising, index, value)
+    return index, value, exact, engine.nodes
+
+class RootSplitSearch:
+    def __init__(self, workers):
+        self.workers = workers
+        self.lock = multiprocessing.Lock()
+        self.best_value = multiprocessing.Value('d', 0.0, lock=False)
+        self.best_index = multiprocessing.Value('i', 0, lock=False)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                        initargs=((self.lock, self.best_value, self.best_index),))
+
+    def search(self, engine, actions, configuration, options):
+        maximising = engine.player == 'x'
+        with self.lock:
+            self.best_value.value = -np.inf if maximising else np.inf
+            self.best_index.value = len(actions)
+
+        state = engine.state if isinstance(engine.state, np.ndarray) else engine.state.to_array()
+        tasks = [(engine.SIZE, engine.WIN_SCORE, engine.player, configuration, options,
+                  state, engine.current_move, action, index)
+                 for index, action in enumerate(actions)]
+        results = sorted(self.pool.map(search_root_action, tasks))
+
+        # Replay the serial root loop over the results in move order so that
+        # ties are broken exactly as the serial search breaks them.
+        best_move = (-1, -1)
+        best_value = -np.inf if maximising else np.inf
+        nodes = 0
+        for index, value, exact, worker_nodes in results:
+            nodes += worker_nodes
+            if not exact:
+                continue
+            if (maximising and value > best_value) or (not maximising and value < best_value):
+                best_value = value
+                best_move = actions[index]
+        return best_move, best_value, nodes + 1
+
+    def shutdown(self):
+        self.pool.shutdown()
@@ -0,0 +1,256 @@
+import argparse
+import sys
+import time
+from solver import Engine
+from options import parse_value
+
+class ProtocolEngine:
+    # Plays through the Gomocup text protocol on stdin and stdout, so a match
+    # harness can run the engine as a plain process, without pygame or the
+    # window. Squares are "x,y" from 0, x along a row, as in Engine.state[x, y].
+    DEFAULT_CONFIGURATION = (0, True, False, False)
+    # The threat search plays forced wins the depth limited search can miss.
+    DEFAULT_OPTIONS = dict(use_transposition_table=True, use_move_ordering=True, use_frontier=True,
+                           use_threat_search=True)
+    SPARSE_BOARD_SIZE = 20
+    # The share of the time for a turn the search may use, the rest is left
+    # for the reply to reach the manager.
+    TIME_SHARE = 0.8
+    # A move never takes more than this share of the time left for the match.
+    MATCH_TIME_SHARE = 0.1
+
+    def __init__(self, configuration=None, options=None, WIN_SCORE=5, output=sys.stdout):
+        self.configuration = tuple(configuration or self.DEFAULT_CONFIGURATION)
+        self.options = dict(self.DEFAULT_OPTIONS)
+        self.options.update(options or {})
+        self.output = output
+        self.SIZE = None
+        self.WIN_SCORE = WIN_SCORE
+        self.timeout_turn = 5.0
+        self.time_left = None
+        self.engine = None
+        # (x, y, own) in the order the stones were played.
+        self.moves = []
+        self.board = None
+        self.running = True
+
+    def send(self, text):
+        print(text, file=self.output, flush=True)
+
+    def serve(self, lines):
+        for line in iter(lines.readline, ''):
+            self.handle(line)
+            if not self.running:
+                break
+        if self.engine is not None:
+            self.engine.shutdown()
+
+    def handle(self, line):
+        line = line.strip()
+        if not line:
+            return
+        if self.board is not None:
+            self.read_board(line)
+            return
+        command, _, argument = line.partition(' ')
+        command = command.upper()
+        handler = getattr(self, 'command_' + command.lower(), None)
+        if handler is None:
+            self.send(f"UNKNOWN {command}")
+            return
+        try:
+            handler(argument.strip())
+        except ValueError as error:
+            self.send(f"ERROR {error}")
+
+    def command_start(self, argument):
+        SIZE = int(argument)
+        if SIZE < 1:
+            raise ValueError(f"a board of size {SIZE} has no squares")
+        # The win length is only checked against the board once there is a
+        # move to play, since managers send INFO win_length after START.
+        self.SIZE = SIZE
+        self.moves = []
+        self.send("OK")
+
+    def command_rectstart(self, argument):
+        width, height = parse_square(argument)
+        if width != height:
+            raise ValueError("only square boards are supported")
+        self.command_start(str(width))
+
+    def command_restart(self, argument):
+        self.check_started()
+        self.moves = []
+        self.send("OK")
+
+    def command_info(self, argument):
+        key, _, value = argument.partition(' ')
+        key = key.lower()
+        # Times are in milliseconds.
+        if key == 'timeout_turn':
+            self.timeout_turn = int(value) / 1000
+        elif key == 'time_left':
+            self.time_left = int(value) / 1000
+        elif key == 'win_length':
+            # Not part of Gomocup, which always plays five in a row.
+            WIN_SCORE = int(value)
+            if self.SIZE is not None and WIN_SCORE > self.SIZE:
+                raise ValueError(f"win length {WIN_SCORE} is longer than the board")
+            self.WIN_SCORE = WIN_SCORE
+        # Other keys, such as max_memory and rule, are accepted and ignored,
+        # as the protocol asks.
+
+    def command_begin(self, argument):
+        self.check_playable()
+        if self.moves:
+            raise ValueError("BEGIN on a board that has stones")
+        self.play()
+
+    def command_turn(self, argument):
+        self.check_playable()
+        x, y = parse_square(argument)
+        self.check_empty(x, y)
+        self.moves.append((x, y, False))
+        self.play()
+
+    def command_board(self, argument):
+        self.check_playable()
+        self.board = []
+
+    def read_board(self, line):
+        if line.upper() == 'DONE':
+            moves, self.board = self.board, None
+            self.moves = []
+            try:
+                for x, y, own in moves:
+                    self.check_empty(x, y)
+                    self.moves.append((x, y, own))
+            except ValueError as error:
+                self.moves = []
+                self.send(f"ERROR {error}")
+                return
+            self.play()
+            return
+        try:
+            x, y, field = (int(value) for value in line.split(','))
+        except ValueError:
+            self.send(f"ERROR expected x,y,field in BOARD, got '{line}'")
+            return
+        if field not in (1, 2):
+            self.send(f"ERROR field {field} is not 1 for own or 2 for opponent")
+            return
+        self.board.append((x, y, field == 1))
+
+    def command_takeback(self, argument):
+        x, y = parse_square(argument)
+        for index, (i, j, _) in enumerate(self.moves):
+            if (i, j) == (x, y):
+                del self.moves[index]
+                self.send("OK")
+                return
+        raise ValueError(f"no stone on {x},{y}")
+
+    def command_about(self, argument):
+        self.send('name="games-and-ai", version="1.0", author="Raahul Singh"')
+
+    def command_end(self, argument):
+        self.running = False
+
+    def check_started(self):
+        if self.SIZE is None:
+            raise ValueError("no START yet")
+
+    def check_playable(self):
+        self.check_started()
+        if self.SIZE < self.WIN_SCORE:
+            raise ValueError(f"a {self.SIZE}x{self.SIZE} board is smaller than the win length {self.WIN_SCORE}")
+
+    def check_empty(self, x, y):
+        if not (0 <= x < self.SIZE and 0 <= y < self.SIZE):
+            raise ValueError(f"{x},{y} is off the board")
+        if any((i, j) == (x, y) for i, j, _ in self.moves):
+            raise ValueError(f"{x},{y} is not empty")
+
+    def time_budget(self):
+        budget = self.timeout_turn
+        if self.time_left is not None:
+            budget = min(budget, self.time_left * self.MATCH_TIME_SHARE)
+        return max(budget * self.TIME_SHARE, 0.01)
+
+    def get_engine(self, player):
+        if self.engine is not None and \
+           (self.engine.SIZE, self.engine.WIN_SCORE, self.engine.player) == (self.SIZE, self.WIN_SCORE, player):
+            return self.engine
+        if self.engine is not None:
+            self.engine.shutdown()
+        options = dict(self.options)
+        if not options.get('use_bitboard'):
+            options.setdefault('use_sparse_board', self.SIZE >= self.SPARSE_BOARD_SIZE)
+        options.setdefault('time_budget', self.time_budget())
+        self.engine = Engine(self.SIZE, self.WIN_SCORE, player)
+        self.engine.model_setup(self.configuration, **options)
+        return self.engine
+
+    def load_state(self, engine):
+        own = 1 if engine.player == 'x' else -1
+        engine.state = engine.new_state()
+        for x, y, is_own in self.moves:
+            engine.state[x, y] = own if is_own else -own
+        if self.moves:
+            # As in the window, localisation keeps to the engine's own last
+            # move, while the win test looks at the last move played.
+            own_moves = [(x, y) for x, y, is_own in self.moves if is_own]
+            x, y, _ = self.moves[-1]
+            engine.current_move = own_moves[-1] if own_moves else (x, y)
+            engine.dummy_move = (x, y)
+            engine.first_move = False
+        else:
+            engine.current_move = (-1, -1)
+            engine.dummy_move = engine.opening_move
+            engine.first_move = True
+
+    def play(self):
+        own = sum(1 for _, _, is_own in self.moves if is_own)
+        player = 'x' if own == len(self.moves) - own else 'o'
+        engine = self.get_engine(player)
+        if 'time_budget' not in self.options:
+            engine.time_budget = self.time_budget()
+        self.load_state(engine)
+        engine.completed_depth = 0
+        start = time.perf_counter()
+        engine.run()
+        x, y = engine.current_move
+        self.moves.append((x, y, True))
+        self.send(f"MESSAGE depth {engine.completed_depth} nodes {engine.nodes} "
+                  f"time {time.perf_counter() - start:.3f}")
+        self.send(f"{x},{y}")
+
+def parse_square(text):
+    try:
+        x, y = (int(value) for value in text.split(','))
+    except ValueError:
+        raise ValueError(f"expected x,y, got '{text}'")
+    return x, y
+
+def main():
+    parser = argparse.ArgumentParser(description="Play as a Gomocup protocol engine on stdin and stdout.")
+    parser.add_argument('--configuration', default='0,1,0,0',
+                        help="DEPTH,ALPHA_BETA,IMPROVEMENT,RANDOMISE as in the tournament engine specs")
+    parser.add_argument('--option', action='append', default=[],
+                        help="model_setup keyword option as name=value, added to the defaults, "
+                             "e.g. use_line_counts=1")
+    parser.add_argument('--win-length', type=int, default=5)
+    arguments = parser.parse_args()
+
+    depth, use_alpha_beta, use_improvement, use_randomisation = arguments.configuration.split(',')
+    configuration = (int(depth), use_alpha_beta == '1', use_improvement == '1', use_randomisation == '1')
+    options = {}
+    for option in arguments.option:
+        key, _, value = option.partition('=')
+        options[key] = parse_value(value)
+
+    ProtocolEngine(configuration, options, arguments.win_length).serve(sys.stdin)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+import numpy as np
+from lines import LineCounter
+
+def board_square(x, y, SIZE):
+    # The boards that are not NumPy arrays index their squares the way an
+    # array does: negative indices count from the far edge, and anything
+    # else off the board is an error rather than a square on the other side.
+    if not (-SIZE <= x < SIZE and -SIZE <= y < SIZE):
+        raise IndexError(f"square {x},{y} is off the {SIZE}x{SIZE} board")
+    return x % SIZE, y % SIZE
+
+class HeadlessBoard:
+    def __init__(self, SIZE, WIN_SCORE):
+        self.SIZE = SIZE
+        self.WIN_SCORE = WIN_SCORE
+        self.lines = LineCounter(self.SIZE, self.WIN_SCORE)
+        self.reset_board()
+
+    def reset_board(self):
+        self.state = np.zeros((self.SIZE, self.SIZE))
+        self.lines.clear()
+        self.move_number = 0
+        self.moves = []
+
+    def is_legal(self, x, y):
+        return 0 <= x < self.SIZE and 0 <= y < self.SIZE and self.state[x, y] == 0
+
+    def to_move(self):
+        return 'x' if self.move_number % 2 == 0 else 'o'
+
+    def play(self, x, y):
+        if not self.is_legal(x, y):
+            raise ValueError(f"Illegal move {(x, y)} on move {self.move_number}")
+        value = 1 if self.to_move() == 'x' else -1
+        self.state[x, y] = value
+        self.lines.add(x, y, value)
+        self.move_number += 1
+        self.moves.append((x, y))
+        return self.win_test()
+
+    # Same convention as Board.win_test: +1 or -1 for a win, None for a
+    # draw and 0 while the game is still going.
+    def win_test(self):
+        result = self.lines.winner()
+        if result != 0:
+            return result
+        elif self.move_number == self.SIZE**2:
+            return None
+        return 0
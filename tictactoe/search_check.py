@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import sys
+import numpy as np
+from solver import Engine
+from benchmark import VARIANTS, load_corpus, decode_board
+
+REFERENCE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'search_reference_v1.json')
+
+# Features that change how a model searches, but never the move it picks or
+# the value it finds.
+OPTION_SETS = [
+    {},
+    dict(use_transposition_table=True),
+    dict(use_move_ordering=True),
+    dict(use_transposition_table=True, use_move_ordering=True),
+    dict(use_bitboard=True),
+    dict(use_line_counts=True),
+    dict(use_sparse_board=True),
+]
+
+def search_position(position, variant, options):
+    # Calls the model's search function directly, set up just as its
+    # perform_ method sets it up, so that the value it finds can be checked
+    # as well as the move.
+    state = decode_board(position['board'])
+    player = 'x' if np.count_nonzero(state == 1) == np.count_nonzero(state == -1) else 'o'
+    search_depth, use_alpha_beta, use_improvement = VARIANTS[variant]
+    if search_depth is None:
+        search_depth = position['depth']
+
+    engine = Engine(position['size'], position['win_score'], player)
+    engine.model_setup((search_depth, use_alpha_beta, use_improvement, False), **options)
+    engine.state = engine.convert_state(state)
+    engine.current_move = tuple(position['last_move'])
+    engine.dummy_move = engine.current_move
+    engine.first_move = False
+    engine.begin_search()
+    if use_alpha_beta and search_depth != 0:
+        engine.search_root_depth = search_depth
+
+    arguments = [engine.state, player]
+    if search_depth != 0:
+        arguments.append(search_depth)
+    if use_alpha_beta:
+        arguments += [-np.inf, np.inf]
+    move, value = getattr(engine, variant)(*arguments)
+    engine.shutdown()
+    return dict(move=[int(move[0]), int(move[1])], value=float(value), nodes=engine.nodes)
+
+def search_corpus(corpus, options, max_empty=9):
+    results = {}
+    for position in corpus['positions']:
+        empty = sum(row.count('.') for row in position['board'])
+        for variant in VARIANTS:
+            # The same positions as the benchmark runs full width searches on.
+            if VARIANTS[variant][0] == 0 and empty > max_empty:
+                continue
+            results[f"{position['id']} {variant}"] = search_position(position, variant, options)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that every search model still finds the moves and values "
+                                                 "it found before the searches were merged into one negamax core.")
+    parser.add_argument('--reference', default=REFERENCE_FILE)
+    parser.add_argument('--write-reference', action='store_true',
+                        help="record the current moves and values as the reference instead of checking them")
+    arguments = parser.parse_args()
+
+    corpus = load_corpus()
+    if arguments.write_reference:
+        with open(arguments.reference, 'w') as reference_file:
+            json.dump(dict(corpus_version=corpus['version'], results=search_corpus(corpus, {})),
+                      reference_file, indent=1, sort_keys=True)
+        return
+
+    with open(arguments.reference) as reference_file:
+        reference = json.load(reference_file)
+    if reference['corpus_version'] != corpus['version']:
+        raise ValueError(f"{arguments.reference} is for corpus version {reference['corpus_version']}, "
+                         f"expected {corpus['version']}")
+
+    mismatches = 0
+    for options in OPTION_SETS:
+        results = search_corpus(corpus, options)
+        for key, expected in reference['results'].items():
+            result = results[key]
+            fields = ['move', 'value']
+            search_depth, use_alpha_beta, _ = VARIANTS[key.split()[1]]
+            if not options and not use_alpha_beta and search_depth is None:
+                # A depth limited search without pruning visits every node,
+                # so visiting fewer means it prunes when it should not.
+                fields.append('nodes')
+            for field in fields:
+                if result[field] != expected[field]:
+                    mismatches += 1
+                    print(f"MISMATCH {key} {options}: {field} {expected[field]} -> {result[field]}")
+    print(f"{mismatches} mismatches against {arguments.reference} over {len(OPTION_SETS)} option sets")
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,447 @@
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from rules import HeadlessBoard
+from parallel import worker_engine
+from tournament import EngineConfig, distribution
+
+class ServerBusy(Exception):
+    pass
+
+class DeadlineExceeded(Exception):
+    pass
+
+def search_move(task):
+    # Runs in a pool process. The whole game is sent with every request, so
+    # any worker can serve any game, and the worker keeps one engine per
+    # configuration so its tables carry over between requests.
+    SIZE, WIN_SCORE, player, configuration, options, moves, time_budget = task
+    if 'time_budget' not in options:
+        # model_setup only picks iterative deepening, the one search that
+        # stops at a deadline, when it is given a time budget. An unlimited
+        # one keeps the key the engine is cached under the same for every
+        # request, and is replaced by this request's budget below.
+        options = dict(options, time_budget=float('inf'))
+    engine = worker_engine(SIZE, WIN_SCORE, player, configuration, options)
+    engine.time_budget = time_budget
+    engine.state = engine.new_state()
+    for index, (x, y) in enumerate(moves):
+        engine.state[x, y] = 1 if index % 2 == 0 else -1
+    if moves:
+        own_moves = moves[0 if player == 'x' else 1::2]
+        engine.current_move = own_moves[-1] if own_moves else moves[-1]
+        engine.dummy_move = moves[-1]
+        engine.first_move = False
+    else:
+        engine.current_move = (-1, -1)
+        engine.dummy_move = engine.opening_move
+        engine.first_move = True
+    start = time.perf_counter()
+    engine.run()
+    x, y = engine.current_move
+    return (int(x), int(y)), engine.nodes, time.perf_counter() - start
+
+class PoolMetrics:
+    SAMPLES = 10000
+
+    def __init__(self):
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.expired = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+        # Seconds, for the latest SAMPLES requests.
+        self.waits = collections.deque(maxlen=self.SAMPLES)
+        self.searches = collections.deque(maxlen=self.SAMPLES)
+        self.latencies = collections.deque(maxlen=self.SAMPLES)
+
+    def as_dict(self, queue_depth):
+        return dict(queue_depth=queue_depth, max_queue_depth=self.max_queue_depth,
+                    submitted=self.submitted, completed=self.completed, rejected=self.rejected,
+                    expired=self.expired, failed=self.failed,
+                    wait=distribution(list(self.waits)), search=distribution(list(self.searches)),
+                    latency=distribution(list(self.latencies)))
+
+class EnginePool:
+    # Move requests wait in a bounded queue in front of a process pool, and
+    # at most one request per worker is inside the pool at a time. A request
+    # that finds the queue full is turned away at once, and one that waited
+    # past its deadline is dropped before it reaches a worker, so the
+    # requests that are served see the same latency however many arrive.
+    MIN_SEARCH_TIME = 0.005
+    # The share of the time left before the deadline the search may use.
+    TIME_SHARE = 0.8
+
+    def __init__(self, workers=None, queue_size=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size or 4 * self.workers
+        self.queue = None
+        self.pool = None
+        self.dispatchers = []
+        self.metrics = PoolMetrics()
+
+    def start(self):
+        self.queue = asyncio.Queue(self.queue_size)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.dispatchers = [asyncio.create_task(self.dispatch()) for _ in range(self.workers)]
+
+    async def close(self):
+        for dispatcher in self.dispatchers:
+            dispatcher.cancel()
+        await asyncio.gather(*self.dispatchers, return_exceptions=True)
+        self.dispatchers = []
+        self.pool.shutdown(cancel_futures=True)
+
+    def retry_after(self):
+        # How long the queue takes to drain at the recent search time.
+        search = sum(self.metrics.searches) / len(self.metrics.searches) if self.metrics.searches else 0.1
+        return self.queue_size * search / self.workers
+
+    async def request(self, SIZE, WIN_SCORE, player, config, moves, time_budget, deadline):
+        future = asyncio.get_running_loop().create_future()
+        task = (SIZE, WIN_SCORE, player, config.configuration, config.options, list(moves), time_budget)
+        try:
+            self.queue.put_nowait((task, deadline, time.perf_counter(), future))
+        except asyncio.QueueFull:
+            self.metrics.rejected += 1
+            raise ServerBusy()
+        self.metrics.submitted += 1
+        self.metrics.max_queue_depth = max(self.metrics.max_queue_depth, self.queue.qsize())
+        return await future
+
+    async def dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            task, deadline, queued, future = await self.queue.get()
+            if future.done():
+                continue
+            start = time.perf_counter()
+            self.metrics.waits.append(start - queued)
+            remaining = deadline - start
+            if remaining < self.MIN_SEARCH_TIME:
+                self.metrics.expired += 1
+                future.set_exception(DeadlineExceeded())
+                continue
+            *fields, time_budget = task
+            time_budget = min(time_budget, remaining * self.TIME_SHARE)
+            pool = self.pool
+            try:
+                move, nodes, search_time = await loop.run_in_executor(pool, search_move, (*fields, time_budget))
+            except Exception as error:
+                self.metrics.failed += 1
+                print(f"engine search failed: {error!r}", file=sys.stderr)
+                if isinstance(error, BrokenProcessPool) and self.pool is pool:
+                    # A worker that dies breaks the whole pool, so the
+                    # requests after this one get a new pool.
+                    pool.shutdown(wait=False)
+                    self.pool = ProcessPoolExecutor(max_workers=self.workers)
+                if not future.done():
+                    future.set_exception(error)
+                continue
+            self.metrics.completed += 1
+            self.metrics.searches.append(search_time)
+            self.metrics.latencies.append(time.perf_counter() - queued)
+            if not future.done():
+                future.set_result(move)
+
+class GameSession:
+    def __init__(self, game_id, SIZE, WIN_SCORE, ai, config):
+        self.game_id = game_id
+        self.board = HeadlessBoard(SIZE, WIN_SCORE)
+        self.ai = ai
+        self.config = config
+        self.result = 0
+        self.last_active = time.monotonic()
+        # Requests for the same game are served one after another.
+        self.lock = asyncio.Lock()
+
+    def play(self, x, y):
+        self.result = self.board.play(x, y)
+
+    def ai_to_move(self):
+        return self.result == 0 and self.board.to_move() == self.ai
+
+    def as_dict(self, moves):
+        return dict(game=self.game_id, moves=[list(move) for move in moves], result=self.result,
+                    to_move=self.board.to_move() if self.result == 0 else None)
+
+class GameServer:
+    # One JSON object per line each way. A request is
+    #   {"op": "new", "size": 15, "win_score": 5, "ai": "o"}
+    #   {"op": "move", "game": 1, "x": 7, "y": 7}
+    #   {"op": "ai", "game": 1}      ask the AI to move again after an error
+    #   {"op": "close", "game": 1}
+    #   {"op": "stats"}
+    # and "deadline", in seconds, may be given with any request that makes
+    # the AI move. A reply that could not get the AI's move carries "error",
+    # "busy" with "retry_after", "deadline" or "engine" if the search
+    # failed, with the game left as it was.
+    # The engine is the server's: clients cannot pass model_setup options,
+    # some of which start processes or write files.
+    # A game belongs to the connection that started it, and is dropped when
+    # that connection closes, or when the server is full and the game has
+    # been left alone for IDLE_TIMEOUT seconds.
+    DEFAULT_ENGINE = EngineConfig('server', (0, True, False, False),
+                                  dict(use_transposition_table=True, use_move_ordering=True,
+                                       use_frontier=True, use_threat_search=True, time_budget=0.1))
+    DEFAULT_DEADLINE = 1.0
+    MAX_SIZE = 100
+    IDLE_TIMEOUT = 600.0
+
+    def __init__(self, pool, max_games=10000, default_engine=None):
+        self.pool = pool
+        self.max_games = max_games
+        self.default_engine = default_engine or self.DEFAULT_ENGINE
+        self.sessions = {}
+        self.next_id = 1
+        self.listener = None
+        # The writer of each open connection, by the task serving it.
+        self.connections = {}
+
+    async def handle_client(self, reader, writer):
+        connection = asyncio.current_task()
+        self.connections[connection] = writer
+        games = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    reply = await self.handle(json.loads(line), games)
+                except KeyError as error:
+                    reply = dict(error=f"missing {error.args[0]}")
+                except (ValueError, TypeError) as error:
+                    reply = dict(error=str(error))
+                writer.write((json.dumps(reply) + '\n').encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections.pop(connection, None)
+            for game_id in games:
+                self.sessions.pop(game_id, None)
+            writer.close()
+
+    async def handle(self, request, games):
+        op = request['op']
+        if op == 'stats':
+            return dict(games=len(self.sessions),
+                        pool=self.pool.metrics.as_dict(self.pool.queue.qsize()))
+        if op == 'new':
+            return await self.new_game(request, games)
+        session = self.sessions.get(request['game']) if request['game'] in games else None
+        if session is None:
+            raise ValueError(f"no game {request['game']}")
+        session.last_active = time.monotonic()
+        if op == 'close':
+            del self.sessions[session.game_id]
+            games.discard(session.game_id)
+            return dict(game=session.game_id, closed=True)
+        async with session.lock:
+            if op == 'move':
+                x, y = int(request['x']), int(request['y'])
+                if session.result != 0 or session.ai_to_move():
+                    raise ValueError(f"it is not your move in game {session.game_id}")
+                session.play(x, y)
+                return await self.ai_move(session, request, [(x, y)])
+            if op == 'ai':
+                return await self.ai_move(session, request, [])
+        raise ValueError(f"unknown op {op}")
+
+    async def new_game(self, request, games):
+        if len(self.sessions) >= self.max_games:
+            self.expire_idle_games()
+        if len(self.sessions) >= self.max_games:
+            raise ValueError("too many games")
+        SIZE = int(request.get('size', 15))
+        WIN_SCORE = int(request.get('win_score', 5))
+        if not 0 < WIN_SCORE <= SIZE <= self.MAX_SIZE:
+            raise ValueError(f"no game of {WIN_SCORE} in a row on a {SIZE}x{SIZE} board")
+        ai = request.get('ai', 'o')
+        if ai not in ('x', 'o'):
+            raise ValueError("ai is 'x' or 'o'")
+        session = GameSession(self.next_id, SIZE, WIN_SCORE, ai, self.default_engine)
+        self.next_id += 1
+        self.sessions[session.game_id] = session
+        games.add(session.game_id)
+        async with session.lock:
+            return await self.ai_move(session, request, [])
+
+    def expire_idle_games(self):
+        idle = time.monotonic() - self.IDLE_TIMEOUT
+        for game_id, session in list(self.sessions.items()):
+            if session.last_active < idle and not session.lock.locked():
+                del self.sessions[game_id]
+
+    async def ai_move(self, session, request, moves):
+        if not session.ai_to_move():
+            return session.as_dict(moves)
+        deadline = time.perf_counter() + float(request.get('deadline', self.DEFAULT_DEADLINE))
+        board = session.board
+        time_budget = session.config.options.get('time_budget', self.DEFAULT_DEADLINE)
+        try:
+            x, y = await self.pool.request(board.SIZE, board.WIN_SCORE, session.ai, session.config,
+                                           board.moves, time_budget, deadline)
+        except ServerBusy:
+            reply = session.as_dict(moves)
+            reply.update(error='busy', retry_after=self.pool.retry_after())
+            return reply
+        except DeadlineExceeded:
+            reply = session.as_dict(moves)
+            reply.update(error='deadline')
+            return reply
+        except Exception:
+            # The pool has already logged it.
+            reply = session.as_dict(moves)
+            reply.update(error='engine')
+            return reply
+        session.play(x, y)
+        return session.as_dict(moves + [(x, y)])
+
+    async def serve(self, host, port):
+        self.pool.start()
+        self.listener = await asyncio.start_server(self.handle_client, host, port, limit=2**16)
+        return self.listener
+
+    async def close(self):
+        # Stops taking connections and closes the open ones, which gives
+        # their tasks a second to finish the request they are on before they
+        # are cancelled, and then stops the engine pool.
+        self.listener.close()
+        for writer in self.connections.values():
+            writer.close()
+        if self.connections:
+            _, pending = await asyncio.wait(list(self.connections), timeout=1.0)
+            for connection in pending:
+                connection.cancel()
+        await self.listener.wait_closed()
+        await self.pool.close()
+
+class LocalClient:
+    # Stands in for a player's client: one connection playing one game with
+    # random moves next to the stones and a think time between them. When
+    # the server is busy it waits retry_after, doubled for each busy reply
+    # in a row and jittered, so that many clients do not retry in step.
+    MAX_BACKOFF = 64
+    def __init__(self, host, port, rng):
+        self.host = host
+        self.port = port
+        self.rng = rng
+        self.latencies = []
+        self.errors = collections.Counter()
+
+    async def send(self, request):
+        start = time.perf_counter()
+        self.writer.write((json.dumps(request) + '\n').encode())
+        await self.writer.drain()
+        reply = json.loads(await self.reader.readline())
+        if 'error' in reply:
+            self.errors[reply['error']] += 1
+        else:
+            self.latencies.append(time.perf_counter() - start)
+        return reply
+
+    async def play(self, SIZE, WIN_SCORE, think_time):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port, limit=2**16)
+        reply = await self.send(dict(op='new', size=SIZE, win_score=WIN_SCORE, ai=self.rng.choice('xo')))
+        game = reply['game']
+        stones = {tuple(move) for move in reply['moves']}
+        backoff = 1
+        while reply.get('result', 0) == 0:
+            if reply.get('error'):
+                await asyncio.sleep(reply.get('retry_after', think_time) * backoff * (0.5 + self.rng.random()))
+                backoff = min(2 * backoff, self.MAX_BACKOFF)
+                reply = await self.send(dict(op='ai', game=game))
+            else:
+                backoff = 1
+                await asyncio.sleep(self.rng.expovariate(1 / think_time) if think_time else 0)
+                x, y = self.choose_move(SIZE, stones)
+                stones.add((x, y))
+                reply = await self.send(dict(op='move', game=game, x=x, y=y))
+            stones.update(tuple(move) for move in reply.get('moves', []))
+        await self.send(dict(op='close', game=game))
+        self.writer.close()
+        await self.writer.wait_closed()
+        return reply['result']
+
+    def choose_move(self, SIZE, stones):
+        near = [(x + i, y + j) for x, y in stones for i in (-1, 0, 1) for j in (-1, 0, 1)]
+        near = [(x, y) for x, y in near if 0 <= x < SIZE and 0 <= y < SIZE and (x, y) not in stones]
+        if near:
+            return self.rng.choice(near)
+        empty = [(x, y) for x in range(SIZE) for y in range(SIZE) if (x, y) not in stones]
+        return self.rng.choice(empty)
+
+async def simulate(games, SIZE, WIN_SCORE, think_time, workers=None, queue_size=None, engine=None, seed=0):
+    pool = EnginePool(workers, queue_size)
+    server = GameServer(pool, games, engine)
+    listener = await server.serve('127.0.0.1', 0)
+    port = listener.sockets[0].getsockname()[1]
+    rng = random.Random(seed)
+    clients = [LocalClient('127.0.0.1', port, random.Random(rng.random())) for _ in range(games)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(client.play(SIZE, WIN_SCORE, think_time) for client in clients))
+    seconds = time.perf_counter() - start
+    stats = await server.handle(dict(op='stats'), set())
+    await server.close()
+    errors = collections.Counter()
+    for client in clients:
+        errors.update(client.errors)
+    latencies = [latency for client in clients for latency in client.latencies]
+    return dict(games=games, seconds=seconds, results=collections.Counter(map(str, results)),
+                errors=dict(errors), latency=distribution(latencies), pool=stats['pool'])
+
+def print_simulation(report):
+    latency = report['latency']
+    pool = report['pool']
+    print(f"{report['games']:>6} games in {report['seconds']:.1f}s  "
+          f"reply p50 {1000 * latency['p50']:.1f} ms  p99 {1000 * latency['p99']:.1f} ms  "
+          f"max {1000 * latency['max']:.1f} ms  pool p99 wait {1000 * pool['wait']['p99']:.1f} ms  "
+          f"search {1000 * pool['search']['p99']:.1f} ms  searches {pool['completed']}  "
+          f"busy {pool['rejected']}  expired {pool['expired']}  max queue {pool['max_queue_depth']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve games against a pool of engine processes.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=None, help="engine processes (default: one per CPU)")
+    parser.add_argument('--queue-size', type=int, default=None,
+                        help="move requests that may wait for a worker (default: 4 per worker)")
+    parser.add_argument('--max-games', type=int, default=10000)
+    parser.add_argument('--engine', help="default engine, NAME=DEPTH,ALPHA_BETA,IMPROVEMENT,RANDOMISE[,option=value...]")
+    parser.add_argument('--simulate', type=int, action='append',
+                        help="instead of serving, play this many local clients at once; may be repeated")
+    parser.add_argument('--size', type=int, default=15)
+    parser.add_argument('--win-score', type=int, default=5)
+    parser.add_argument('--think-time', type=float, default=1.0, help="mean seconds a local client waits per move")
+    arguments = parser.parse_args()
+
+    engine = EngineConfig.parse(arguments.engine) if arguments.engine else None
+    if arguments.simulate:
+        for games in arguments.simulate:
+            report = asyncio.run(simulate(games, arguments.size, arguments.win_score, arguments.think_time,
+                                          arguments.workers, arguments.queue_size, engine))
+            print_simulation(report)
+        return
+
+    async def serve():
+        server = GameServer(EnginePool(arguments.workers, arguments.queue_size), arguments.max_games, engine)
+        listener = await server.serve(arguments.host, arguments.port)
+        try:
+            await listener.serve_forever()
+        finally:
+            await server.close()
+
+    asyncio.run(serve())
+
+if __name__ == '__main__':
+    main()
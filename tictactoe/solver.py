@@ -1,14 +1,28 @@
+import math
 import numpy as np
 import random
+import time
+from bitboard import BitBoard
+from sparse import SparseBoard
+from transposition import ZobristHash, LazyZobristHash, SymmetricZobristHash, TranspositionTable, EXACT, LOWER, UPPER
+from ordering import MoveOrdering
+from lines import LineCounter
+from frontier import Frontier
+from instrumentation import Instrumentation
+
+class SearchTimeout(Exception):
+    pass
 
 class Engine:
     def __init__(self, SIZE, WIN_SCORE, player, randomize=True,
-                use_improvement=True, search_depth=0):
+                use_improvement=True, search_depth=0, use_bitboard=False, use_sparse_board=False):
 
         self.SIZE = SIZE
         self.WIN_SCORE = WIN_SCORE
         self.player = player
-        self.state = np.zeros((self.SIZE, self.SIZE))
+        self.use_bitboard = use_bitboard
+        self.use_sparse_board = use_sparse_board
+        self.state = self.new_state()
         self.opening_move = (self.SIZE // 2, self.SIZE // 2)
         self.current_move = (-1, -1)
         self.dummy_move = self.opening_move
@@ -16,13 +30,125 @@ class Engine:
         self.first_move = True
         self.use_improvement = use_improvement
         self.search_depth = search_depth
-
-    def model_setup(self, configuration):
+        self.FULL_DEPTH = self.SIZE * self.SIZE
+        self.zobrist = self.new_zobrist()
+        self.hash_key = 0
+        self.transposition_table = None
+        self.use_alpha_beta = False
+        self.time_budget = None
+        self.node_budget = None
+        self.deadline = np.inf
+        self.node_limit = np.inf
+        self.nodes = 0
+        self.completed_depth = 0
+        self.move_ordering = None
+        self.search_root_depth = 0
+        self.previous_best_move = None
+        self.previous_value = None
+        self.principal_variation = []
+        self.pv_table = []
+        self.aspiration_window = 32
+        self.workers = None
+        self.root_split = None
+        self.lazy_smp = None
+        self.stop_event = None
+        self.start_depth = 1
+        self.line_counter = None
+        self.frontier = None
+        self.instrumentation = None
+        self.symmetry = None
+        self.symmetric_keys = []
+        self.canonical_symmetry = 0
+        self.tablebase = None
+        self.opening_book = None
+        self.threat_search = None
+        self.mcts = None
+        self.playout_budget = None
+
+    def model_setup(self, configuration, use_bitboard=False, use_transposition_table=False,
+                    transposition_table_size=2**18, time_budget=None, node_budget=None,
+                    use_move_ordering=False, workers=None, use_lazy_smp=False, use_line_counts=False,
+                    use_instrumentation=False, trace=None,
+                    use_symmetry=False, tablebase=None, opening_book=None, use_threat_search=False,
+                    threat_depth=40, use_mcts=False, playout_budget=None, aspiration_window=32,
+                    use_frontier=False, frontier_radius=2, use_sparse_board=False):
         search_depth, use_alpha_beta, use_improvement, use_randomisation = configuration
+        self.configuration = tuple(configuration)
+        self.worker_options = dict(use_bitboard=use_bitboard,
+                                   use_transposition_table=use_transposition_table,
+                                   transposition_table_size=transposition_table_size,
+                                   use_move_ordering=use_move_ordering,
+                                   use_line_counts=use_line_counts,
+                                   use_symmetry=use_symmetry,
+                                   use_frontier=use_frontier,
+                                   frontier_radius=frontier_radius,
+                                   use_sparse_board=use_sparse_board)
         self.randomize = use_randomisation
         self.use_improvement = use_improvement
+        self.use_alpha_beta = use_alpha_beta
         self.search_depth = search_depth
-        if not use_alpha_beta:
+        self.time_budget = time_budget
+        self.node_budget = node_budget
+        self.aspiration_window = aspiration_window
+        self.transposition_table_size = transposition_table_size
+        if workers != self.workers or use_lazy_smp != (self.lazy_smp is not None):
+            self.shutdown()
+            self.workers = workers
+        if use_bitboard and use_sparse_board:
+            raise ValueError("use_bitboard and use_sparse_board are two different board representations")
+        if use_bitboard != self.use_bitboard or use_sparse_board != self.use_sparse_board:
+            if use_sparse_board != self.use_sparse_board:
+                self.use_sparse_board = use_sparse_board
+                self.zobrist = self.new_zobrist()
+            self.use_bitboard = use_bitboard
+            self.state = self.convert_state(self.state)
+        if use_transposition_table:
+            self.transposition_table = TranspositionTable(transposition_table_size)
+        else:
+            self.transposition_table = None
+        if self.lazy_smp is not None:
+            # A Lazy SMP search kept from the last setup shares its table with
+            # its helper processes, so the main searcher has to keep using it.
+            self.transposition_table = self.lazy_smp.table
+        if use_symmetry:
+            self.symmetry = SymmetricZobristHash(self.SIZE)
+        else:
+            self.symmetry = None
+        if use_line_counts:
+            self.line_counter = LineCounter(self.SIZE, self.WIN_SCORE)
+        else:
+            self.line_counter = None
+        if use_frontier or use_sparse_board:
+            # A sparse board only finds its moves near its stones.
+            self.frontier = Frontier(self.SIZE, frontier_radius)
+        else:
+            self.frontier = None
+        if use_move_ordering:
+            self.move_ordering = MoveOrdering(self.SIZE, use_randomisation)
+        else:
+            self.move_ordering = None
+        if use_instrumentation:
+            if self.instrumentation is None:
+                self.instrumentation = Instrumentation(self, trace)
+                self.instrumentation.install()
+            else:
+                self.instrumentation.close()
+                self.instrumentation.trace = trace
+        elif self.instrumentation is not None:
+            self.instrumentation.uninstall()
+            self.instrumentation = None
+        self.playout_budget = playout_budget
+        if not use_mcts:
+            self.mcts = None
+        if use_mcts:
+            self.model = self.perform_mcts
+        elif use_lazy_smp and workers is not None and workers > 1:
+            self.model = self.perform_lazy_smp
+        elif time_budget is not None or node_budget is not None:
+            self.model = self.perform_iterative_deepening
+        elif workers is not None and workers > 1:
+            self.model = self.perform_root_split_search
+        elif not use_alpha_beta:
             if self.search_depth == 0:
                 self.model = self.perform_minimax
             else:
@@ -32,33 +158,96 @@ class Engine:
                 self.model = self.perform_minimax_alpha_beta_pruning
             else:
                 self.model = self.perform_depth_limited_alpha_beta_pruning
+        if tablebase is not None:
+            from tablebase import open_tablebase
+            self.tablebase = open_tablebase(tablebase)
+            if (self.tablebase.SIZE, self.tablebase.WIN_SCORE) != (self.SIZE, self.WIN_SCORE):
+                raise ValueError(f"{tablebase} is a tablebase for {self.tablebase.SIZE}x{self.tablebase.SIZE} "
+                                 f"boards with win score {self.tablebase.WIN_SCORE}")
+            self.search_model = self.model
+            self.model = self.perform_tablebase
+        else:
+            self.tablebase = None
+        if opening_book is not None:
+            from book import open_book
+            self.opening_book = open_book(opening_book)
+        else:
+            self.opening_book = None
+        if use_threat_search:
+            from threats import ThreatSearch
+            self.threat_search = ThreatSearch(self.SIZE, self.WIN_SCORE, threat_depth)
+        else:
+            self.threat_search = None
 
     def run(self):
-        if self.first_move:
+        if self.opening_book is not None and self.play_book_move():
+            self.first_move = False
+        elif self.first_move and self.tablebase is None:
             self.open_game()
             self.first_move = False
         else:
-            self.model()
+            self.first_move = False
+            self.begin_search()
+            if self.threat_search is None or not self.play_threat_move():
+                self.model()
+
+    def begin_search(self):
+        self.nodes = 0
+        self.previous_best_move = None
+        self.previous_value = None
+        self.principal_variation = []
+        if self.move_ordering is not None:
+            self.move_ordering.new_search()
+        if self.line_counter is not None:
+            self.line_counter.load(self.state)
+        if self.frontier is not None:
+            self.frontier.load(self.state)
+        if self.symmetry is not None:
+            self.symmetric_keys = self.symmetry.hash_states(self.state, self.player)
+            self.hash_key, self.canonical_symmetry = self.symmetry.canonical(self.symmetric_keys)
+        elif self.transposition_table is not None:
+            self.hash_key = self.zobrist.hash_state(self.state, self.player)
+        if self.transposition_table is not None:
+            self.transposition_table.new_search()
+
+    def new_state(self):
+        if self.use_bitboard:
+            return BitBoard(self.SIZE, self.WIN_SCORE)
+        if self.use_sparse_board:
+            return SparseBoard(self.SIZE, self.WIN_SCORE)
+        return np.zeros((self.SIZE, self.SIZE))
+
+    def new_zobrist(self):
+        if self.use_sparse_board:
+            return LazyZobristHash(self.SIZE)
+        return ZobristHash(self.SIZE)
+
+    def convert_state(self, state):
+        if isinstance(state, (BitBoard, SparseBoard)):
+            state = state.to_array()
+        if self.use_bitboard:
+            return BitBoard.from_array(state, self.WIN_SCORE)
+        if self.use_sparse_board:
+            return SparseBoard.from_array(state, self.WIN_SCORE)
+        return state
 
     def reset(self):
-        self.state = np.zeros((self.SIZE, self.SIZE))
+        self.state = self.new_state()
         self.opening_move = (self.SIZE // 2, self.SIZE // 2)
         self.current_move = (-1, -1)
         self.dummy_move = self.opening_move
         self.first_move = True
+        if self.move_ordering is not None:
+            self.move_ordering.reset()
+        if self.mcts is not None:
+            self.mcts.clear()
 
     def open_game(self):
         x, y = self.opening_move
         if self.state[x, y] != 0:
             x += 1
             y += 1
-
-        if self.player == 'x':
-            self.state[x, y] = 1
-        else:
-            self.state[x, y] = -1
-        self.current_move = (x, y)
-        self.dummy_move = (x, y)
+        self.play_move((x, y))
 
     def perform_minimax(self):
     
@@ -66,13 +255,7 @@ class Engine:
             (x, y), _ = self.improved_minimax(self.state, self.player)
         else:
             (x, y), _ = self.minimax(self.state, self.player)
-    
-        if self.player == 'x':
-            self.state[x, y] = 1
-        else:
-            self.state[x, y] = -1
-        self.current_move = (x, y)
-        self.dummy_move = self.current_move
+        self.play_move((x, y))
 
     def perform_minimax_alpha_beta_pruning(self):
     
@@ -80,13 +263,7 @@ class Engine:
             (x, y), val = self.improved_minimax_alpha_beta_pruning(self.state, self.player, -np.inf, np.inf)
         else:
             (x, y), val = self.minimax_alpha_beta_pruning(self.state, self.player, -np.inf, np.inf)
-    
-        if self.player == 'x':
-            self.state[x, y] = 1
-        else:
-            self.state[x, y] = -1
-        self.current_move = (x, y)
-        self.dummy_move = self.current_move
+        self.play_move((x, y))
 
     def perform_depth_limited_minimax(self):
 
@@ -94,36 +271,318 @@ class Engine:
             (x, y), _ = self.improved_depth_limited_minimax(self.state, self.player, self.search_depth)
         else:
             (x, y), _ = self.depth_limited_minimax(self.state, self.player, self.search_depth)
-
-        if self.player == 'x':
-            self.state[x, y] = 1
-        else:
-            self.state[x, y] = -1
-        self.current_move = (x, y)
-        self.dummy_move = self.current_move
+        self.play_move((x, y))
 
     def perform_depth_limited_alpha_beta_pruning(self):
+        self.search_root_depth = self.search_depth
         if self.use_improvement:
             (x, y), val = self.improved_depth_limited_alpha_beta_pruning(self.state, self.player, self.search_depth, -np.inf, np.inf)
         else:
             (x, y), val = self.depth_limited_alpha_beta_pruning(self.state, self.player, self.search_depth, -np.inf, np.inf)
-        if self.player == 'x':
-            self.state[x, y] = 1
+        self.play_move((x, y))
+
+    def perform_root_split_search(self):
+        if self.root_split is None:
+            from parallel import RootSplitSearch
+            self.root_split = RootSplitSearch(self.workers)
+
+        actions = self.get_actions(self.state)
+        if self.use_improvement:
+            actions = self.localisation_improvement(actions)
+        if self.use_alpha_beta and self.search_depth != 0:
+            self.search_root_depth = self.search_depth
+            actions = self.order_actions(actions, self.search_depth)
+
+        (x, y), _, self.nodes = self.root_split.search(self, actions, self.configuration,
+                                                       self.worker_options)
+        self.play_move((x, y))
+
+    def shutdown(self):
+        if self.root_split is not None:
+            self.root_split.shutdown()
+            self.root_split = None
+        if self.lazy_smp is not None:
+            self.lazy_smp.shutdown()
+            self.lazy_smp = None
+            self.transposition_table = None
+        if self.instrumentation is not None:
+            self.instrumentation.close()
+
+    def make_move(self, state, action, value):
+        x, y = action
+        state[x, y] = value
+        self.dummy_move = action
+        if self.symmetry is not None:
+            self.update_symmetric_keys(x, y, value)
+        elif self.transposition_table is not None:
+            self.hash_key ^= self.zobrist.piece_key(x, y, value) ^ self.zobrist.side_key
+        if self.line_counter is not None:
+            self.line_counter.push(x, y, value)
+        if self.frontier is not None:
+            self.frontier.add(x, y)
+
+    def unmake_move(self, state, action, value):
+        x, y = action
+        state[x, y] = 0
+        if self.symmetry is not None:
+            self.update_symmetric_keys(x, y, value)
+        elif self.transposition_table is not None:
+            self.hash_key ^= self.zobrist.piece_key(x, y, value) ^ self.zobrist.side_key
+        if self.line_counter is not None:
+            self.line_counter.pop()
+        if self.frontier is not None:
+            self.frontier.remove(x, y)
+
+    def update_symmetric_keys(self, x, y, value):
+        self.symmetric_keys = self.symmetry.update(self.symmetric_keys, x, y, value)
+        self.hash_key, self.canonical_symmetry = self.symmetry.canonical(self.symmetric_keys)
+
+    def probe_transposition(self, depth, alpha, beta):
+        if self.transposition_table is None:
+            return None
+        entry = self.transposition_table.probe(self.hash_key)
+        if entry is None or entry[3] < depth:
+            return None
+        _, value, bound, _, move, _ = entry
+        if (bound == EXACT or (bound == LOWER and value >= beta)
+                or (bound == UPPER and value <= alpha)):
+            if self.symmetry is not None:
+                move = self.symmetry.from_canonical(move, self.canonical_symmetry)
+            return move, value
+        return None
+
+    def store_transposition(self, depth, alpha, beta, best_move, best_value):
+        if self.transposition_table is not None:
+            if best_value <= alpha:
+                bound = UPPER
+            elif best_value >= beta:
+                bound = LOWER
+            else:
+                bound = EXACT
+            move = best_move
+            if self.symmetry is not None:
+                # Moves are stored as they are on the canonical board.
+                move = self.symmetry.to_canonical(move, self.canonical_symmetry)
+            self.transposition_table.store(self.hash_key, best_value, bound, depth, move)
+        return best_move, best_value
+
+    def perform_iterative_deepening(self):
+        self.play_move(self.iterative_deepening())
+
+    def iterative_deepening(self):
+        self.completed_depth = 0
+        if self.time_budget is not None:
+            self.deadline = time.perf_counter() + self.time_budget
+        if self.node_budget is not None:
+            self.node_limit = self.node_budget
+
+        root_state = self.state.copy()
+        root_keys = self.hash_key, self.symmetric_keys, self.canonical_symmetry
+        if self.use_bitboard:
+            empty_squares = len(self.state.empty_cells())
+        elif self.use_sparse_board:
+            empty_squares = self.state.empty_count()
+        else:
+            empty_squares = int(np.count_nonzero(self.state == 0))
+        max_depth = min(self.search_depth or self.FULL_DEPTH, empty_squares)
+        best_move = (-1, -1)
+
+        try:
+            for depth in range(min(self.start_depth, max_depth), max_depth + 1):
+                move, value = self.iterative_deepening_search(depth)
+                if move != (-1, -1):
+                    best_move = move
+                    self.previous_best_move = move
+                self.previous_value = value
+                self.completed_depth = depth
+        except SearchTimeout:
+            self.state = root_state
+            self.hash_key, self.symmetric_keys, self.canonical_symmetry = root_keys
+            if self.frontier is not None:
+                self.frontier.load(self.state)
+        finally:
+            self.deadline = np.inf
+            self.node_limit = np.inf
+
+        if best_move == (-1, -1):
+            best_move = self.fallback_move()
+        return best_move
+
+    def predicted_reply(self):
+        # The opponent's move that the last search expected after the move
+        # just played, from the principal variation or the search tree.
+        if self.mcts is not None and self.mcts.root is not None:
+            node = self.mcts.root.children.get(self.current_move)
+            if node is None or not node.children:
+                return None
+            move = max(node.children.values(), key=lambda child: child.visits).move
+        elif len(self.principal_variation) > 1 and self.principal_variation[0] == self.current_move:
+            move = self.principal_variation[1]
         else:
-            self.state[x, y] = -1
+            return None
+        if self.state[move[0], move[1]] != 0:
+            return None
+        return move
+
+    def play_move(self, move):
+        # Every model plays its move through here. A search in which every
+        # move loses, or that has no move left after localisation, returns
+        # (-1, -1), which as an index would be the far corner of the board.
+        x, y = move
+        if not (0 <= x < self.SIZE and 0 <= y < self.SIZE) or self.state[x, y] != 0:
+            x, y = self.fallback_move()
+        self.state[x, y] = 1 if self.player == 'x' else -1
         self.current_move = (x, y)
         self.dummy_move = self.current_move
 
+    def fallback_move(self):
+        # The move played when a search is stopped before it has any result.
+        actions = self.get_actions(self.state)
+        if self.use_improvement:
+            actions = self.localisation_improvement(actions) or actions
+        return actions[0]
+
+    def play_threat_move(self):
+        move = self.threat_search.find_win(self.state, self.player)
+        self.nodes += self.threat_search.nodes
+        if move is None:
+            return False
+        self.play_move(move)
+        return True
+
+    def play_book_move(self):
+        move = self.opening_book.probe(self.state)
+        if move is None or self.state[move] != 0:
+            return False
+        self.play_move(move)
+        return True
+
+    def perform_tablebase(self):
+        entry = self.tablebase.probe(self.state)
+        if entry is None or entry[1] == (-1, -1):
+            self.search_model()
+            return
+        self.play_move(entry[1])
+
+    def perform_mcts(self):
+        if self.mcts is None:
+            from mcts import MonteCarloTreeSearch
+            self.mcts = MonteCarloTreeSearch(self.SIZE, self.WIN_SCORE)
+        state = self.state if isinstance(self.state, np.ndarray) else self.state.to_array()
+        x, y = self.mcts.search(state, self.player, self.time_budget, self.playout_budget, self.stop_event)
+        self.nodes = self.mcts.playouts
+        self.play_move((x, y))
+
+    def perform_lazy_smp(self):
+        if self.lazy_smp is None:
+            from lazy_smp import LazySMPSearch
+            self.lazy_smp = LazySMPSearch(self.SIZE, self.workers, self.transposition_table_size)
+            self.transposition_table = self.lazy_smp.table
+            self.begin_search()
+
+        (x, y), self.completed_depth, self.nodes = self.lazy_smp.search(
+            self, self.configuration, dict(self.worker_options, use_transposition_table=False))
+        self.play_move((x, y))
+
+    def iterative_deepening_search(self, depth):
+        self.search_root_depth = depth
+        if self.use_alpha_beta:
+            if self.use_improvement:
+                search = self.improved_depth_limited_alpha_beta_pruning
+            else:
+                search = self.depth_limited_alpha_beta_pruning
+            if self.previous_value is None or not np.isfinite(self.previous_value) or not self.aspiration_window:
+                return search(self.state, self.player, depth, -np.inf, np.inf)
+
+            # Aspiration window: the value is most likely close to the one
+            # from the last depth, and a narrow window around it prunes more.
+            # A search that fails outside the window is repeated with that
+            # side widened until the value lands inside. A won or lost value
+            # cannot lie any further out, so it is exact as it is.
+            window = self.aspiration_window
+            alpha = self.previous_value - window
+            beta = self.previous_value + window
+            while True:
+                move, value = search(self.state, self.player, depth, alpha, beta)
+                if not np.isfinite(value) or alpha < value < beta:
+                    return move, value
+                window *= 4
+                if value <= alpha:
+                    alpha = self.previous_value - window
+                else:
+                    beta = self.previous_value + window
+        if self.use_improvement:
+            return self.improved_depth_limited_minimax(self.state, self.player, depth)
+        return self.depth_limited_minimax(self.state, self.player, depth)
+
+    def visit_node(self):
+        self.nodes += 1
+        if self.nodes >= self.node_limit:
+            raise SearchTimeout()
+        if self.nodes & 255 == 0:
+            if time.perf_counter() > self.deadline:
+                raise SearchTimeout()
+            if self.stop_event is not None and self.stop_event.is_set():
+                raise SearchTimeout()
+
     def get_actions(self, state):
-        actions = []
-        for i in range(self.SIZE):
-            for j in range(self.SIZE):
-                if self.state[i, j] == 0:
-                    actions.append((i,j))
-        if self.randomize:
+        if self.frontier is not None and self.frontier.cells:
+            actions = self.frontier.actions()
+        elif self.use_bitboard or self.use_sparse_board:
+            actions = state.empty_cells()
+        else:
+            actions = []
+            for i in range(self.SIZE):
+                for j in range(self.SIZE):
+                    if state[i, j] == 0:
+                        actions.append((i,j))
+        if self.symmetry is not None:
+            actions = self.unique_actions(actions)
+        if self.randomize and self.move_ordering is None:
             actions = random.sample(actions, len(actions))
         return actions
 
+    def unique_actions(self, actions):
+        # On a position that is its own mirror image, moves that are images
+        # of each other lead to the same game, so only the first of them in
+        # row-major order is kept.
+        stabiliser = self.symmetry.stabiliser(self.symmetric_keys)
+        if self.use_improvement and stabiliser:
+            # Localisation keeps the squares near the last move, which only
+            # the symmetries that fix that square leave unchanged.
+            x, y = self.current_move
+            stabiliser = [s for s in stabiliser if self.symmetry.maps[s][x][y] == (x, y)]
+        if not stabiliser:
+            return actions
+        maps = self.symmetry.maps
+        return [action for action in actions
+                if all(maps[s][action[0]][action[1]] >= action for s in stabiliser)]
+
+    def hash_move(self):
+        if self.transposition_table is None:
+            return None
+        entry = self.transposition_table.probe(self.hash_key)
+        if entry is None:
+            return None
+        if self.symmetry is not None:
+            return self.symmetry.from_canonical(entry[4], self.canonical_symmetry)
+        return entry[4]
+
+    def order_actions(self, actions, depth, pv_move=None):
+        if self.move_ordering is None:
+            return actions
+        ply = self.search_root_depth - depth
+        best_move = self.previous_best_move if ply == 0 else pv_move
+        if best_move is None:
+            best_move = self.hash_move()
+        return self.move_ordering.order(actions, ply, best_move)
+
+    def record_cutoff(self, action, depth, move_index):
+        # Full width searches do not order their moves, they only report
+        # cutoffs so that they can be counted.
+        if self.move_ordering is not None and depth != self.FULL_DEPTH:
+            self.move_ordering.record_cutoff(action, self.search_root_depth - depth, depth, move_index)
+
     def update_sum(self, a, b):
         if b == 0:
             return 0
@@ -229,483 +688,176 @@ class Engine:
 
         return heuristic_value
 
-    def evaluation_heuristic(self, state, player):
-        heuristic_value = self.board_traversal_heuristic(state, self.dummy_move)
-        return heuristic_value
-
-    def goal_test(self, state):
-        return self.board_traversal(state, self.dummy_move)
-
-    def localisation_improvement(self, possible_actions):
-        actions = []
-        for i in possible_actions:
-            if self.get_distance(i) < self.WIN_SCORE:
-                actions.append(i)
+    def bitboard_traversal_heuristic(self, state, current_move):
 
-        return actions
-
-    def get_distance(self, square_i):
-        return np.sqrt(np.abs(square_i[0] - self.current_move[0]) ** 2 + 
-                np.abs(square_i[1] - self.current_move[1]) ** 2)
+        x, y = current_move
+        centre = state[x, y]
+        sums = [centre] * 8
+        x_bits = state.x_bits
+        o_bits = state.o_bits
+        heuristic_value = 0
 
-    def minimax(self, state, player):
-        value = self.goal_test(state)
+        for step in state.RAYS[x][y]:
+            for k in range(8):
+                if x_bits & step[k]:
+                    sums[k] += 1
+                elif o_bits & step[k]:
+                    sums[k] -= 1
 
-        if value != 0:
-            return (-1, -1), value
+            if centre == 1:
+                if (sums[0] + sums[4] >= self.WIN_SCORE or
+                    sums[1] + sums[5] >= self.WIN_SCORE or
+                    sums[2] + sums[6] >= self.WIN_SCORE or
+                    sums[3] + sums[7] >= self.WIN_SCORE):
 
-        elif player == 'x':
-            best_value = -np.inf
-            best_move = (-1, -1)
-            actions = self.get_actions(state)
+                    return np.inf
 
-            if len(actions) == 0:
-                return (-1, -1), 0
+            else:
+                if (sums[0] + sums[4] <= -self.WIN_SCORE or
+                    sums[1] + sums[5] <= -self.WIN_SCORE or
+                    sums[2] + sums[6] <= -self.WIN_SCORE or
+                    sums[3] + sums[7] <= -self.WIN_SCORE):
 
-            for action in actions:
-                x, y = action
-                state[x, y] = 1
-                self.dummy_move = (x, y)
-                max_move, max_value = self.minimax(state, 'o')
-                state[x, y] = 0
+                    return -np.inf
 
-                if max_value > best_value:
-                    best_value = max_value
-                    best_move = action
+        for k in sums:
+            heuristic_value += (k ** 2) if centre == -1 else -(k ** 2)
 
-            return best_move, best_value
+        return heuristic_value
 
-        else:
-            best_value = np.inf
-            best_move = (-1, -1)
-            actions = self.get_actions(state)
+    def evaluation_heuristic(self, state, player):
+        if self.use_bitboard:
+            return self.bitboard_traversal_heuristic(state, self.dummy_move)
+        heuristic_value = self.board_traversal_heuristic(state, self.dummy_move)
+        return heuristic_value
 
-            if len(actions) == 0:
-                return (-1, -1), 0
+    def goal_test(self, state):
+        if self.line_counter is not None:
+            return self.line_counter.winner()
+        if self.use_bitboard:
+            return state.winner()
+        return self.board_traversal(state, self.dummy_move)
 
-            for action in actions:
-                x, y = action
-                state[x, y] = -1
-                self.dummy_move = (x, y)
-                min_move, min_value = self.minimax(state, 'x')
-                state[x, y] = 0
-                if min_value < best_value:
-                    best_value = min_value
-                    best_move = action
+    def localisation_improvement(self, possible_actions):
+        # Comparing squared distances keeps the same squares without taking
+        # a square root for each of them.
+        x, y = self.current_move
+        limit = self.WIN_SCORE * self.WIN_SCORE
+        actions = []
+        for i, j in possible_actions:
+            if (i - x) ** 2 + (j - y) ** 2 < limit:
+                actions.append((i, j))
 
-            return best_move, best_value
+        return actions
 
+    # All eight search models are the same negamax search underneath. The
+    # wrappers keep their old signatures, taking and returning values from
+    # X's point of view, while inside the search every value is from the
+    # point of view of the player to move.
+    def minimax(self, state, player):
+        return self.search(state, player, None, -np.inf, np.inf, False, False)
 
     def improved_minimax(self, state, player):
-        value = self.goal_test(state)
-
-        if value != 0:
-            return (-1, -1), value
-
-        elif player == 'x':
-            best_value = -np.inf
-            best_move = (-1, -1)
-            possible_actions = self.get_actions(state)
-
-            if len(possible_actions) == 0:
-                return (-1, -1), 0
-
-            actions = self.localisation_improvement(possible_actions)
-
-
-            for action in actions:
-                x, y = action
-                state[x, y] = 1
-                self.dummy_move = (x, y)
-                max_move, max_value = self.minimax(state, 'o')
-                state[x, y] = 0
-
-                if max_value > best_value:
-                    best_value = max_value
-                    best_move = action
-
-            return best_move, best_value
-
-        else:
-            best_value = np.inf
-            best_move = (-1, -1)
-            possible_actions = self.get_actions(state)
-
-            if len(possible_actions) == 0:
-                return (-1, -1), 0
-
-            actions = self.localisation_improvement(possible_actions)
-
-            for action in actions:
-                x, y = action
-                state[x, y] = -1
-                self.dummy_move = (x, y)
-                min_move, min_value = self.minimax(state, 'x')
-                state[x, y] = 0
-                if min_value < best_value:
-                    best_value = min_value
-                    best_move = action
-
-            return best_move, best_value
-
+        return self.search(state, player, None, -np.inf, np.inf, False, True)
 
     def minimax_alpha_beta_pruning(self, state, player, alpha, beta):
-        value = self.goal_test(state)
-
-        if value != 0:
-            return (-1, -1), value
-
-        elif player == 'x':
-            best_value = -np.inf
-            best_move = (-1, -1)
-            actions = self.get_actions(state)
-
-            if len(actions) == 0:
-                return (-1, -1), 0
-
-            for action in actions:
-                x, y = action
-                state[x, y] = 1
-                self.dummy_move = (x, y)
-                max_move, max_value = self.minimax_alpha_beta_pruning(state, 'o', alpha, beta)
-                state[x, y] = 0
-
-                if max_value > best_value:
-                    best_value = max_value
-                    best_move = action
-
-                if max_value < alpha:
-                    alpha = max_value
-                
-                if alpha >= beta:
-                    break
-
-            return best_move, best_value
-
-        else:
-            best_value = np.inf
-            best_move = (-1, -1)
-            actions = self.get_actions(state)
-
-            if len(actions) == 0:
-                return (-1, -1), 0
-
-            for action in actions:
-                x, y = action
-                state[x, y] = -1
-                self.dummy_move = (x, y)
-                min_move, min_value = self.minimax_alpha_beta_pruning(state, 'x', alpha, beta)
-                state[x, y] = 0
-                if min_value < best_value:
-                    best_value = min_value
-                    best_move = action
-
-                if min_value < beta:
-                    beta = min_value
-
-                if alpha >= beta:
-                    break
-
-            return best_move, best_value
+        return self.search(state, player, None, alpha, beta, True, False)
 
     def improved_minimax_alpha_beta_pruning(self, state, player, alpha, beta):
-        value = self.goal_test(state)
-
-        if value != 0:
-            return (-1, -1), value
-
-        elif player == 'x':
-            best_value = -np.inf
-            best_move = (-1, -1)
-            possible_actions = self.get_actions(state)
-
-            if len(possible_actions) == 0:
-                return (-1, -1), 0
-
-            actions = self.localisation_improvement(possible_actions)
-
-            for action in actions:
-                x, y = action
-                state[x, y] = 1
-                self.dummy_move = (x, y)
-                max_move, max_value = self.minimax_alpha_beta_pruning(state, 'o', alpha, beta)
-                state[x, y] = 0
-
-                if max_value > best_value:
-                    best_value = max_value
-                    best_move = action
-
-                if max_value < alpha:
-                    alpha = max_value
-                
-                if alpha >= beta:
-                    break
-
-            return best_move, best_value
-
-        else:
-            best_value = np.inf
-            best_move = (-1, -1)
-            possible_actions = self.get_actions(state)
-
-            if len(possible_actions) == 0:
-                return (-1, -1), 0
-
-            actions = self.localisation_improvement(possible_actions)
-
-            for action in actions:
-                x, y = action
-                state[x, y] = -1
-                self.dummy_move = (x, y)
-                min_move, min_value = self.minimax_alpha_beta_pruning(state, 'x', alpha, beta)
-                state[x, y] = 0
-                if min_value < best_value:
-                    best_value = min_value
-                    best_move = action
-
-                if min_value < beta:
-                    beta = min_value
-
-                if alpha >= beta:
-                    break
-
-            return best_move, best_value
+        return self.search(state, player, None, alpha, beta, True, True)
 
     def depth_limited_minimax(self, state, player, depth):
-
-        if depth == 0:
-            return (-1, -1), self.evaluation_heuristic(state, player)
-
-        value = self.goal_test(state)
-
-        if value != 0:
-            return (-1, -1), value
-
-        elif player == 'x':
-            best_value = -np.inf
-            best_move = (-1, -1)
-            actions = self.get_actions(state)
-
-            if len(actions) == 0:
-                return (-1, -1), 0
-
-            for action in actions:
-                x, y = action
-                state[x, y] = 1
-                self.dummy_move = (x, y)
-                max_move, max_value = self.depth_limited_minimax(state, 'o', depth-1)
-                state[x, y] = 0
-
-                if max_value > best_value:
-                    best_value = max_value
-                    best_move = action
-
-            return best_move, best_value
-
-        else:
-            best_value = np.inf
-            best_move = (-1, -1)
-            actions = self.get_actions(state)
-
-            if len(actions) == 0:
-                return (-1, -1), 0
-
-            for action in actions:
-                x, y = action
-                state[x, y] = -1
-                self.dummy_move = (x, y)
-                min_move, min_value = self.depth_limited_minimax(state, 'x', depth-1)
-                state[x, y] = 0
-                if min_value < best_value:
-                    best_value = min_value
-                    best_move = action
-
-            return best_move, best_value
+        return self.search(state, player, depth, -np.inf, np.inf, False, False)
 
     def improved_depth_limited_minimax(self, state, player, depth):
-
-        if depth == 0:
-            return (-1, -1), self.evaluation_heuristic(state, player)
-
-        value = self.goal_test(state)
-
-        if value != 0:
-            return (-1, -1), value
-
-        elif player == 'x':
-            best_value = -np.inf
-            best_move = (-1, -1)
-            possible_actions = self.get_actions(state)
-
-            if len(possible_actions) == 0:
-                return (-1, -1), 0
-
-            actions = self.localisation_improvement(possible_actions)
-
-            for action in actions:
-                x, y = action
-                state[x, y] = 1
-                self.dummy_move = (x, y)
-                max_move, max_value = self.depth_limited_minimax(state, 'o', depth-1)
-                state[x, y] = 0
-
-                if max_value > best_value:
-                    best_value = max_value
-                    best_move = action
-
-            return best_move, best_value
-
-        else:
-            best_value = np.inf
-            best_move = (-1, -1)
-            possible_actions = self.get_actions(state)
-
-            if len(possible_actions) == 0:
-                return (-1, -1), 0
-
-            actions = self.localisation_improvement(possible_actions)
-
-            for action in actions:
-                x, y = action
-                state[x, y] = -1
-                self.dummy_move = (x, y)
-                min_move, min_value = self.depth_limited_minimax(state, 'x', depth-1)
-                state[x, y] = 0
-                if min_value < best_value:
-                    best_value = min_value
-                    best_move = action
-
-            return best_move, best_value
+        return self.search(state, player, depth, -np.inf, np.inf, False, True)
 
     def depth_limited_alpha_beta_pruning(self, state, player, depth, alpha, beta):
+        return self.search(state, player, depth, alpha, beta, True, False)
 
-        if depth == 0:
-            return (-1, -1), self.evaluation_heuristic(state, player)
-
-        value = self.goal_test(state)
-
-        if value != 0:
-            return (-1, -1), value
-
-        elif player == 'x':
-            best_value = -np.inf
-            best_move = (-1, -1)
-            actions = self.get_actions(state)
-
-            if len(actions) == 0:
-                return (-1, -1), 0
-
-            for action in actions:
-                x, y = action
-                state[x, y] = 1
-                self.dummy_move = (x, y)
-                max_move, max_value = self.depth_limited_alpha_beta_pruning(state, 'o', depth-1, alpha, beta)
-                state[x, y] = 0
-
-                if max_value > best_value:
-                    best_value = max_value
-                    best_move = action
-
-                if max_value > alpha:
-                    alpha = max_value
-                
-                if alpha >= beta:
-                    break
-
-            return best_move, best_value
+    def improved_depth_limited_alpha_beta_pruning(self, state, player, depth, alpha, beta):
+        return self.search(state, player, depth, alpha, beta, True, True)
 
+    def search(self, state, player, depth, alpha, beta, use_pruning, use_localisation):
+        self.pv_table = [[] for _ in range((self.FULL_DEPTH if depth is None else depth) + 2)]
+        if player == 'x':
+            move, value = self.negamax(state, player, depth, alpha, beta, 0, use_pruning, use_localisation, True)
         else:
-            best_value = np.inf
-            best_move = (-1, -1)
-            actions = self.get_actions(state)
+            move, value = self.negamax(state, player, depth, -beta, -alpha, 0, use_pruning, use_localisation, True)
+            value = -value
+        self.principal_variation = self.pv_table[0]
+        return move, value
 
-            if len(actions) == 0:
-                return (-1, -1), 0
-
-            for action in actions:
-                x, y = action
-                state[x, y] = -1
-                self.dummy_move = (x, y)
-                min_move, min_value = self.depth_limited_alpha_beta_pruning(state, 'x', depth-1, alpha, beta)
-                state[x, y] = 0
-
-                if min_value < best_value:
-                    best_value = min_value
-                    best_move = action
-
-                if min_value < beta:
-                    beta = min_value
-                
-                if alpha >= beta:
-                    break
-
-            return best_move, best_value
-
-
-    def improved_depth_limited_alpha_beta_pruning(self, state, player, depth, alpha, beta):
+    def negamax(self, state, player, depth, alpha, beta, ply, use_pruning, use_localisation, on_pv):
+        # A depth of None searches to the end of the game.
+        self.visit_node()
+        self.pv_table[ply] = []
+        sign = 1 if player == 'x' else -1
 
         if depth == 0:
-            return (-1, -1), self.evaluation_heuristic(state, player)
+            return (-1, -1), sign * self.evaluation_heuristic(state, player)
 
         value = self.goal_test(state)
 
         if value != 0:
-            return (-1, -1), value
-
-        elif player == 'x':
-            best_value = -np.inf
-            best_move = (-1, -1)
-            possible_actions = self.get_actions(state)
-
-            if len(possible_actions) == 0:
-                return (-1, -1), 0
-
-            actions = self.localisation_improvement(possible_actions)
-
-            for action in actions:
-                x, y = action
-                state[x, y] = 1
-                self.dummy_move = (x, y)
-                max_move, max_value = self.depth_limited_alpha_beta_pruning(state, 'o', depth-1, alpha, beta)
-                state[x, y] = 0
-
-                if max_value > best_value:
-                    best_value = max_value
-                    best_move = action
-
-                if max_value > alpha:
-                    alpha = max_value
-                
-                if alpha >= beta:
-                    break
-
-            return best_move, best_value
-
-        else:
-            best_value = np.inf
-            best_move = (-1, -1)
-            possible_actions = self.get_actions(state)
-
-            if len(possible_actions) == 0:
-                return (-1, -1), 0
-
-            actions = self.localisation_improvement(possible_actions)
-
-            for action in actions:
-                x, y = action
-                state[x, y] = -1
-                self.dummy_move = (x, y)
-                min_move, min_value = self.depth_limited_alpha_beta_pruning(state, 'x', depth-1, alpha, beta)
-                state[x, y] = 0
-
-                if min_value < best_value:
-                    best_value = min_value
-                    best_move = action
-
-                if min_value < beta:
-                    beta = min_value
-                
-                if alpha >= beta:
-                    break
-
-            return best_move, best_value
+            return (-1, -1), sign * value
+
+        table_depth = self.FULL_DEPTH if depth is None else depth
+        x_alpha, x_beta = (alpha, beta) if sign == 1 else (-beta, -alpha)
+        transposition = self.probe_transposition(table_depth, x_alpha, x_beta)
+        if transposition is not None:
+            move, value = transposition
+            return move, sign * value
+
+        actions = self.get_actions(state)
+
+        if len(actions) == 0:
+            return (-1, -1), 0
+
+        if use_localisation and ply == 0:
+            actions = self.localisation_improvement(actions)
+
+        on_pv = on_pv and ply < len(self.principal_variation)
+        if use_pruning and depth is not None:
+            actions = self.order_actions(actions, depth, self.principal_variation[ply] if on_pv else None)
+
+        opponent = 'o' if player == 'x' else 'x'
+        child_depth = None if depth is None else depth - 1
+        best_value = -np.inf
+        best_move = (-1, -1)
+
+        for index, action in enumerate(actions):
+            child_on_pv = on_pv and action == self.principal_variation[ply]
+            self.make_move(state, action, sign)
+            if index == 0 or not use_pruning:
+                _, value = self.negamax(state, opponent, child_depth, -beta, -alpha, ply + 1,
+                                        use_pruning, False, child_on_pv)
+                value = -value
+            else:
+                # Principal variation search: a move after the first is
+                # expected to be no better, which a null window just above
+                # alpha proves cheaply. Only a move that turns out better is
+                # searched again with the full window.
+                _, value = self.negamax(state, opponent, child_depth, -math.nextafter(alpha, np.inf), -alpha,
+                                        ply + 1, use_pruning, False, child_on_pv)
+                value = -value
+                if alpha < value < beta:
+                    _, value = self.negamax(state, opponent, child_depth, -beta, -value, ply + 1,
+                                            use_pruning, False, child_on_pv)
+                    value = -value
+            self.unmake_move(state, action, sign)
+
+            if value > best_value:
+                best_value = value
+                best_move = action
+
+            if value > alpha:
+                alpha = value
+                self.pv_table[ply] = [action] + self.pv_table[ply + 1]
+
+            if use_pruning and alpha >= beta:
+                self.record_cutoff(action, table_depth, index)
+                break
+
+        self.store_transposition(table_depth, x_alpha, x_beta, best_move, sign * best_value)
+        return best_move, best_value
@@ -0,0 +1,46 @@
+import numpy as np
+from rules import board_square
+
+class SparseBoard:
+    # Only the stones are stored, in a dictionary from (x, y) to 1 or -1, so
+    # the memory and the work per move grow with the number of stones
+    # rather than with the area of the board.
+    def __init__(self, SIZE, WIN_SCORE):
+        self.SIZE = SIZE
+        self.WIN_SCORE = WIN_SCORE
+        self.cells = {}
+
+    def __getitem__(self, index):
+        return self.cells.get(board_square(*index, self.SIZE), 0)
+
+    def __setitem__(self, index, value):
+        square = board_square(*index, self.SIZE)
+        if value != 0:
+            self.cells[square] = 1 if value > 0 else -1
+        else:
+            self.cells.pop(square, None)
+
+    def copy(self):
+        board = SparseBoard(self.SIZE, self.WIN_SCORE)
+        board.cells = dict(self.cells)
+        return board
+
+    def empty_cells(self):
+        return [(i, j) for i in range(self.SIZE) for j in range(self.SIZE) if (i, j) not in self.cells]
+
+    def empty_count(self):
+        return self.SIZE * self.SIZE - len(self.cells)
+
+    def to_array(self):
+        state = np.zeros((self.SIZE, self.SIZE))
+        for (i, j), value in self.cells.items():
+            state[i, j] = value
+        return state
+
+    @classmethod
+    def from_array(cls, state, WIN_SCORE):
+        SIZE = len(state)
+        board = cls(SIZE, WIN_SCORE)
+        for i, j in zip(*np.nonzero(state)):
+            board[int(i), int(j)] = state[i][j]
+        return board
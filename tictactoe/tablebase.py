@@ -0,0 +1,134 @@
+import argparse
+import mmap
+import struct
+import time
+import numpy as np
+from functools import lru_cache
+from evaluator import evaluate_boards
+
+MAGIC = b'TTTB'
+VERSION = 1
+HEADER = struct.Struct('<4sBBB9x')
+# Every position is one byte: the game value in the top two bits and the
+# best move plus one in the low six, with 0 meaning no move.
+O_WINS, DRAW, X_WINS = 1, 2, 3
+MOVE_BITS = 6
+MAX_CELLS = 16
+
+def default_path(SIZE, WIN_SCORE):
+    return f"tablebase_{SIZE}x{SIZE}_{WIN_SCORE}.bin"
+
+def powers_of_three(SIZE):
+    return 3 ** np.arange(SIZE * SIZE, dtype=np.int64)
+
+def position_index(state, powers):
+    # Positions are numbered in base 3, one digit per square in row-major
+    # order: 0 for an empty square, 1 for X and 2 for O.
+    board = np.asarray(state).reshape(-1)
+    digits = np.where(board > 0, 1, np.where(board < 0, 2, 0))
+    return int(digits @ powers)
+
+def generate_tablebase(SIZE, WIN_SCORE, path=None, chunk_size=2**18, verbose=False):
+    cells = SIZE * SIZE
+    if cells > MAX_CELLS:
+        raise ValueError(f"A {SIZE}x{SIZE} board has too many positions for a tablebase")
+    path = path or default_path(SIZE, WIN_SCORE)
+    total = 3 ** cells
+    powers = powers_of_three(SIZE)
+    # Scores count the empty squares left when the game ends, so that the
+    # best move wins as fast and loses as slowly as it can. Only their sign
+    # is written to the file.
+    scores = np.zeros(total, dtype=np.int8)
+    packed = np.zeros(total, dtype=np.uint8)
+    start_time = time.perf_counter()
+
+    # A move only ever adds to the index of a position, so going through
+    # the positions from the highest index down solves every child before
+    # its parent. Inside a chunk, positions with more stones come first.
+    for end in range(total, 0, -chunk_size):
+        start = max(0, end - chunk_size)
+        index = np.arange(start, end, dtype=np.int64)
+        digits = ((index[:, None] // powers[None, :]) % 3).astype(np.int8)
+        x_stones = (digits == 1).sum(axis=1)
+        o_stones = (digits == 2).sum(axis=1)
+        legal = (x_stones == o_stones) | (x_stones == o_stones + 1)
+        index, digits = index[legal], digits[legal]
+        x_stones, o_stones = x_stones[legal], o_stones[legal]
+        stones = x_stones + o_stones
+
+        boards = np.where(digits == 1, 1, np.where(digits == 2, -1, 0)).reshape(-1, SIZE, SIZE)
+        values, terminal = evaluate_boards(boards, WIN_SCORE)
+        empty_after = (cells - stones + 1).astype(np.int8)
+        end_scores = np.where(values > 0, empty_after, np.where(values < 0, -empty_after, 0))
+        scores[index[terminal]] = end_scores[terminal]
+        packed[index[terminal]] = np.where(values[terminal] > 0, X_WINS,
+                                           np.where(values[terminal] < 0, O_WINS, DRAW)) << MOVE_BITS
+
+        for level in range(cells - 1, -1, -1):
+            rows = ~terminal & (stones == level)
+            if not rows.any():
+                continue
+            x_to_move = x_stones[rows] == o_stones[rows]
+            empty = digits[rows] == 0
+            stone = np.where(x_to_move, 1, 2)[:, None]
+            children = scores[index[rows][:, None] + np.where(empty, stone * powers[None, :], 0)].astype(np.int16)
+            best_for_x = np.where(empty, children, -128).argmax(axis=1)
+            best_for_o = np.where(empty, children, 128).argmin(axis=1)
+            moves = np.where(x_to_move, best_for_x, best_for_o)
+            best = children[np.arange(len(moves)), moves]
+            scores[index[rows]] = best
+            value = np.where(best > 0, X_WINS, np.where(best < 0, O_WINS, DRAW))
+            packed[index[rows]] = (value << MOVE_BITS) | (moves + 1)
+
+        if verbose and (end // chunk_size) % 16 == 0:
+            print(f"{total - start}/{total} positions, {time.perf_counter() - start_time:.1f}s", flush=True)
+
+    with open(path, 'wb') as output:
+        output.write(HEADER.pack(MAGIC, VERSION, SIZE, WIN_SCORE))
+        output.write(packed.tobytes())
+    return path
+
+class Tablebase:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as tablebase_file:
+            magic, version, self.SIZE, self.WIN_SCORE = HEADER.unpack(tablebase_file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} tablebase")
+            # The file is mapped read only, so every process that opens it
+            # shares the same pages of the page cache.
+            self.memory = mmap.mmap(tablebase_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.table = np.frombuffer(self.memory, dtype=np.uint8, offset=HEADER.size)
+        self.powers = powers_of_three(self.SIZE)
+
+    def probe(self, state):
+        if not isinstance(state, np.ndarray):
+            state = state.to_array()
+        entry = int(self.table[position_index(state, self.powers)])
+        value = entry >> MOVE_BITS
+        if value == 0:
+            return None
+        move = (entry & ((1 << MOVE_BITS) - 1)) - 1
+        best_move = (-1, -1) if move < 0 else divmod(move, self.SIZE)
+        return {X_WINS: 1, DRAW: 0, O_WINS: -1}[value], best_move
+
+    def close(self):
+        self.table = None
+        self.memory.close()
+
+@lru_cache(maxsize=None)
+def open_tablebase(path):
+    return Tablebase(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve every position of a small game and write a tablebase.")
+    parser.add_argument('--size', type=int, default=3)
+    parser.add_argument('--win-score', type=int, default=3)
+    parser.add_argument('--output', help="defaults to tablebase_<size>x<size>_<win score>.bin")
+    arguments = parser.parse_args()
+    start = time.perf_counter()
+    path = generate_tablebase(arguments.size, arguments.win_score, arguments.output, verbose=True)
+    print(f"Wrote {path} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import numpy as np
+from lines import LineCounter
+from transposition import ZobristHash
+
+class ThreatSearch:
+    # Victory by continuous fours: the attacker only plays moves that leave
+    # a line one stone short of WIN_SCORE, so every defender move is forced
+    # and the tree stays narrow however deep the win is.
+    def __init__(self, SIZE, WIN_SCORE, max_depth=40, node_budget=100000):
+        self.SIZE = SIZE
+        self.WIN_SCORE = WIN_SCORE
+        self.max_depth = max_depth
+        self.node_budget = node_budget
+        self.lines = LineCounter(self.SIZE, self.WIN_SCORE)
+        self.zobrist = ZobristHash(self.SIZE)
+        self.nodes = 0
+
+    def find_win(self, state, player):
+        if not isinstance(state, np.ndarray):
+            state = state.to_array()
+        self.state = state.copy()
+        self.lines.load(self.state)
+        self.hash_key = self.zobrist.hash_state(self.state, player)
+        self.failed = {}
+        self.nodes = 0
+        value = 1 if player == 'x' else -1
+        line = self.attack(value, self.max_depth)
+        return line[0] if line else None
+
+    def counts(self, value):
+        if value > 0:
+            return self.lines.x_counts, self.lines.o_counts
+        return self.lines.o_counts, self.lines.x_counts
+
+    def winning_squares(self, value):
+        own, other = self.counts(value)
+        squares = set()
+        for window, cells in enumerate(self.lines.windows):
+            if own[window] == self.WIN_SCORE - 1 and other[window] == 0:
+                for x, y in cells:
+                    if self.state[x, y] == 0:
+                        squares.add((x, y))
+        return squares
+
+    def four_moves(self, value):
+        # Every empty square that completes a line of WIN_SCORE - 1 in some
+        # window still free of the opponent, with the squares that do so in
+        # the most windows first, since they are the likeliest double fours.
+        own, other = self.counts(value)
+        fours = {}
+        for window, cells in enumerate(self.lines.windows):
+            if own[window] == self.WIN_SCORE - 2 and other[window] == 0:
+                for x, y in cells:
+                    if self.state[x, y] == 0:
+                        fours[x, y] = fours.get((x, y), 0) + 1
+        return sorted(fours, key=fours.__getitem__, reverse=True)
+
+    def play(self, move, value):
+        x, y = move
+        self.state[x, y] = value
+        self.lines.add(x, y, value)
+        self.hash_key ^= self.zobrist.piece_key(x, y, value) ^ self.zobrist.side_key
+
+    def unplay(self, move, value):
+        x, y = move
+        self.state[x, y] = 0
+        self.lines.remove(x, y, value)
+        self.hash_key ^= self.zobrist.piece_key(x, y, value) ^ self.zobrist.side_key
+
+    def attack(self, value, depth):
+        self.nodes += 1
+        wins = self.winning_squares(value)
+        if wins:
+            return [min(wins)]
+        if (depth <= 0 or self.nodes >= self.node_budget
+                or self.failed.get(self.hash_key, -1) >= depth):
+            return None
+
+        # A four of the defender has to be blocked first, and that is only
+        # still part of a forced win if the block is itself a four.
+        candidates = self.four_moves(value)
+        threats = self.winning_squares(-value)
+        if len(threats) > 1:
+            return None
+        if threats:
+            candidates = [move for move in candidates if move in threats]
+
+        for move in candidates:
+            self.play(move, value)
+            replies = self.winning_squares(value)
+            if len(replies) > 1:
+                line = [move]
+            else:
+                (reply,) = replies
+                self.play(reply, -value)
+                line = self.attack(value, depth - 2)
+                self.unplay(reply, -value)
+                if line is not None:
+                    line = [move, reply] + line
+            self.unplay(move, value)
+            if line is not None:
+                return line
+
+        if self.nodes < self.node_budget:
+            self.failed[self.hash_key] = depth
+        return None
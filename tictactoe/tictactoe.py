@@ -1,24 +1,31 @@
+import time
+# Taken before pygame and the engine are imported, for the startup timing.
+PROCESS_START = time.perf_counter()
+import argparse
 import pygame
+import threading
 import numpy as np
-from solver import Engine
-from IO import NumericalInput, ToggleButton
+from solver import Engine, SearchTimeout
+from sparse import SparseBoard
+from IO import NumericalInput, ToggleButton, StartupTimer, render_text, load_sprite
 
 class IO():
     
-    def __init__(self, SCREEN_WIDTH=800, SCREEN_HEIGHT=800):
+    def __init__(self, SCREEN_WIDTH=800, SCREEN_HEIGHT=800, timer=None):
         self.SCREEN_WIDTH = SCREEN_WIDTH
         self.SCREEN_HEIGHT = SCREEN_HEIGHT
+        self.timer = timer or StartupTimer()
     
     def welcome_user(self):
-        welcome_font = pygame.font.SysFont('Times New Roman', 50)
-        welcome_text = welcome_font.render("Press any key to Continue!", True, pygame.Color('black'))
+        self.timer.begin('welcome screen')
+        welcome_text = render_text("Press any key to Continue!", 'Times New Roman', 50)
 
-        welcome_page = pygame.transform.scale(pygame.image.load('welcome.png'),
-                                            (self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
+        welcome_page = load_sprite('welcome.png', (self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
 
         welcome_text_background = pygame.Surface((welcome_text.get_width() + 20, welcome_text.get_height() + 20))
         screen = pygame.display.set_mode((self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
 
+        self.timer.end('welcome screen')
         running = True
 
         while(running):
@@ -38,21 +45,18 @@ class IO():
             pygame.display.flip()
 
     def show_ui_instructions(self):
-        heading_font = pygame.font.SysFont('Times New Roman', 50)
-        instruction_font = pygame.font.SysFont('Times New Roman', 32)        
-        heading_text = heading_font.render("User Interface Instuctions!", True, pygame.Color('black'))
-        numerical_instuctions = instruction_font.render("For numerical inputs, " +
-                                                        "click on the box and type an integer!",
-                                                         True, pygame.Color('black'))
-        button_instuctions = instruction_font.render("For button inputs " + 
-                                                     "click on the button to toggle!", 
-                                                      True, pygame.Color('black'))
-        submit_instuctions = instruction_font.render("Finally, click on 'Submit' to continue!",
-                                                      True, pygame.Color('black'))
-        instruction_text = instruction_font.render("Press any key to Continue!", True, pygame.Color('black'))
+        self.timer.begin('interface instructions')
+        heading_text = render_text("User Interface Instuctions!", 'Times New Roman', 50)
+        numerical_instuctions = render_text("For numerical inputs, " +
+                                            "click on the box and type an integer!", 'Times New Roman', 32)
+        button_instuctions = render_text("For button inputs " +
+                                         "click on the button to toggle!", 'Times New Roman', 32)
+        submit_instuctions = render_text("Finally, click on 'Submit' to continue!", 'Times New Roman', 32)
+        instruction_text = render_text("Press any key to Continue!", 'Times New Roman', 32)
 
         screen = pygame.display.set_mode((self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
 
+        self.timer.end('interface instructions')
         running = True
 
         while(running):
@@ -73,17 +77,17 @@ class IO():
 
 
     def show_game_instructions(self):
-        heading_font = pygame.font.SysFont('Times New Roman', 50)
-        instruction_font = pygame.font.SysFont('Times New Roman', 32)        
-        heading_text = heading_font.render("Playing Instuctions!", True, pygame.Color('black'))
-        player_instuctions = instruction_font.render("Click on a square to mark it!", True, pygame.Color('black'))
-        ai_instuctions = instruction_font.render("Then, click anywhere to let AI play!", True, pygame.Color('black'))
-        ai_warning = instruction_font.render("The AI will only start to 'think' after you have clicked.", True, pygame.Color('black'))
-        ai_clarification = instruction_font.render("Doesn't matter where you click on AI's turn!", True, pygame.Color('black'))
-        instruction_text = instruction_font.render("Press any key to Continue!", True, pygame.Color('black'))
+        self.timer.begin('game instructions')
+        heading_text = render_text("Playing Instuctions!", 'Times New Roman', 50)
+        player_instuctions = render_text("Click on a square to mark it!", 'Times New Roman', 32)
+        ai_instuctions = render_text("Then, click anywhere to let AI play!", 'Times New Roman', 32)
+        ai_warning = render_text("The AI will only start to 'think' after you have clicked.", 'Times New Roman', 32)
+        ai_clarification = render_text("Doesn't matter where you click on AI's turn!", 'Times New Roman', 32)
+        instruction_text = render_text("Press any key to Continue!", 'Times New Roman', 32)
 
         screen = pygame.display.set_mode((self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
 
+        self.timer.end('game instructions')
         running = True
 
         while(running):
@@ -104,11 +108,11 @@ class IO():
             pygame.display.flip()
 
     def get_configuration(self):
+        self.timer.begin('setup screen')
         screen = pygame.display.set_mode((self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
-        configuration_font = pygame.font.SysFont('Times New Roman', 32)
-        heading = configuration_font.render("System Setup!", True, pygame.Color('black'))
+        heading = render_text("System Setup!", 'Times New Roman', 32)
         warn = False
-        warning = configuration_font.render("Please fix Input!", True, pygame.Color('black'))
+        warning = render_text("Please fix Input!", 'Times New Roman', 32)
         clock = pygame.time.Clock()
         board_size = NumericalInput(self.SCREEN_WIDTH * 0.60, self.SCREEN_HEIGHT * 0.30, 50, 32, "Board Size ?", 30, text="3")
         win_score = NumericalInput(self.SCREEN_WIDTH * 0.60, self.SCREEN_HEIGHT * 0.40, 50, 32, "Win Score ?", 30, text="3")
@@ -116,6 +120,7 @@ class IO():
         player_y = ToggleButton(self.SCREEN_WIDTH * 0.60, self.SCREEN_HEIGHT * 0.60, 50, 32, "Is player O an AI?", 30)
         submit = ToggleButton(self.SCREEN_WIDTH * 0.45, self.SCREEN_HEIGHT * 0.80, 50, 32,"", 0, text_inactive="Submit?")
         input_boxes = [board_size, win_score, player_x, player_y, submit]
+        self.timer.end('setup screen')
         running = True
 
         while running:
@@ -151,11 +156,11 @@ class IO():
         return (board_size.text, win_score.text, player_x.active, player_y.active)
 
     def get_ai_configuration(self, player):
+        self.timer.begin('AI setup screen')
         screen = pygame.display.set_mode((self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
-        configuration_font = pygame.font.SysFont('Times New Roman', 32)
-        heading = configuration_font.render(f"Player {player} AI Setup!", True, pygame.Color('black'))
+        heading = render_text(f"Player {player} AI Setup!", 'Times New Roman', 32)
         warn = False
-        warning = configuration_font.render("Please fix Input!", True, pygame.Color('black'))
+        warning = render_text("Please fix Input!", 'Times New Roman', 32)
         clock = pygame.time.Clock()
         search_depth = NumericalInput(self.SCREEN_WIDTH * 0.60, self.SCREEN_HEIGHT * 0.30, 50, 32, "Search Depth ? '0' denotes full depth", 30, text='0')
         use_alpha_beta = ToggleButton(self.SCREEN_WIDTH * 0.60, self.SCREEN_HEIGHT * 0.40, 50, 32, "Use Alpha Beta Pruning ?", 30)
@@ -163,6 +168,7 @@ class IO():
         use_randomisation = ToggleButton(self.SCREEN_WIDTH * 0.60, self.SCREEN_HEIGHT * 0.60, 50, 32, "Use Randomisation ?", 30)
         submit = ToggleButton(self.SCREEN_WIDTH * 0.45, self.SCREEN_HEIGHT * 0.80, 50, 32,"", 0, text_inactive="Submit?")
         input_boxes = [search_depth, use_alpha_beta, use_improvement, use_randomisation, submit]
+        self.timer.end('AI setup screen')
         running = True
 
         while running:
@@ -198,8 +204,8 @@ class IO():
         return (search_depth.text, use_alpha_beta.active, use_improvement.active, use_randomisation.active)
 
     def postgame(self, winner, x_score=0, o_score=0, draw=0):
+        self.timer.begin('score screen')
         screen = pygame.display.set_mode((self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
-        configuration_font = pygame.font.SysFont('Times New Roman', 32)
         
         win_text = "This round was a draw!"
         if winner == 1:
@@ -207,17 +213,18 @@ class IO():
         elif winner == -1:
             win_text = "O won this round!"
 
-        current_winner = configuration_font.render(win_text, True, pygame.Color('black'))
+        current_winner = render_text(win_text, 'Times New Roman', 32)
 
-        heading = configuration_font.render("   Overall Score", True, pygame.Color('black'))
-        x_score = configuration_font.render(f"X Won      {x_score} times", True, pygame.Color('black'))
-        o_score = configuration_font.render(f"O Won      {o_score} times", True, pygame.Color('black'))
-        draw = configuration_font.render(f"Game Drawn    {draw} times", True, pygame.Color('black'))
+        heading = render_text("   Overall Score", 'Times New Roman', 32)
+        x_score = render_text(f"X Won      {x_score} times", 'Times New Roman', 32)
+        o_score = render_text(f"O Won      {o_score} times", 'Times New Roman', 32)
+        draw = render_text(f"Game Drawn    {draw} times", 'Times New Roman', 32)
 
         clock = pygame.time.Clock()
         replay = ToggleButton(self.SCREEN_WIDTH * 0.20, self.SCREEN_HEIGHT * 0.80, 50, 32,"", 0, text_inactive="Click to replay!")
         end = ToggleButton(self.SCREEN_WIDTH * 0.60, self.SCREEN_HEIGHT * 0.80, 50, 32,"", 0, text_inactive="Click to end!")
         input_boxes = [replay, end]
+        self.timer.end('score screen')
         running = True
 
         while running:
@@ -249,17 +256,17 @@ class IO():
             clock.tick(30)
 
     def bid_adieu(self, x_score=0, o_score=0, draw=0):
-        heading_font = pygame.font.SysFont('Times New Roman', 50)
-        configuration_font = pygame.font.SysFont('Times New Roman', 32)        
-        heading = heading_font.render("Thanks for playing!", True, pygame.Color('black'))
-        final_score = configuration_font.render("   Final Score!", True, pygame.Color('black'))
-        x_score = configuration_font.render(f"X Won      {x_score} times", True, pygame.Color('black'))
-        o_score = configuration_font.render(f"O Won      {o_score} times", True, pygame.Color('black'))
-        draw = configuration_font.render(f"Game Drawn    {draw} times", True, pygame.Color('black'))
-        goodbye = configuration_font.render("Press any key to bid adieu!", True, pygame.Color('black'))
+        self.timer.begin('farewell screen')
+        heading = render_text("Thanks for playing!", 'Times New Roman', 50)
+        final_score = render_text("   Final Score!", 'Times New Roman', 32)
+        x_score = render_text(f"X Won      {x_score} times", 'Times New Roman', 32)
+        o_score = render_text(f"O Won      {o_score} times", 'Times New Roman', 32)
+        draw = render_text(f"Game Drawn    {draw} times", 'Times New Roman', 32)
+        goodbye = render_text("Press any key to bid adieu!", 'Times New Roman', 32)
 
         screen = pygame.display.set_mode((self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
 
+        self.timer.end('farewell screen')
         running = True
 
         while(running):
@@ -281,7 +288,7 @@ class IO():
             
 class Board(pygame.sprite.Sprite):
 
-    def __init__(self, SCREEN_WIDTH, SCREEN_HEIGHT, SIZE, WIN_SCORE, players):
+    def __init__(self, SCREEN_WIDTH, SCREEN_HEIGHT, SIZE, WIN_SCORE, players, sparse=False):
         super(Board, self).__init__()
         self.SCREEN_WIDTH = SCREEN_WIDTH
         self.SCREEN_HEIGHT = SCREEN_HEIGHT
@@ -292,30 +299,73 @@ class Board(pygame.sprite.Sprite):
         self.CHAR_WIDTH = int(0.60 * self.WIDTH_STEP)
         self.CHAR_HEIGHT = int(0.60 * self.HEIGHT_STEP)
         self.screen = pygame.display.set_mode([self.SCREEN_WIDTH, self.SCREEN_HEIGHT])
-        self.state = np.zeros((self.SIZE, self.SIZE))
-        self.x = pygame.transform.scale(pygame.image.load('X.png'),
-                                       (self.CHAR_WIDTH, self.CHAR_HEIGHT))
-        self.o = pygame.transform.scale(pygame.image.load('O.png'),
-                                       (self.CHAR_WIDTH, self.CHAR_HEIGHT))
+        self.sparse = sparse
+        self.state = self.new_state()
+        self.x = load_sprite('X.png', (self.CHAR_WIDTH, self.CHAR_HEIGHT))
+        self.o = load_sprite('O.png', (self.CHAR_WIDTH, self.CHAR_HEIGHT))
         self.move_number = 0
         self.players = players
+        self.status_rect = None
+        # The empty grid is drawn once, and only the parts of the screen
+        # that changed are sent to the display.
+        self.grid = pygame.Surface((self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
+        self.grid.fill((255, 255, 255))
+        self.draw_lines(self.grid)
+        self.dirty_rects = []
 
     def draw_board(self):
-        self.screen.fill((255, 255, 255))
-        self.draw_lines()
+        self.screen.blit(self.grid, (0, 0))
         self.update()
+        self.status_rect = None
+        self.dirty_rects = [self.screen.get_rect()]
 
-    def draw_lines(self):
+    def draw_lines(self, surface):
 
         for i in range(1, self.SIZE):
-            pygame.draw.line(self.screen, (0, 0, 0), 
+            pygame.draw.line(surface, (0, 0, 0), 
                             (self.WIDTH_STEP*i, 0), 
                             (self.WIDTH_STEP*i, self.SCREEN_HEIGHT))
 
-            pygame.draw.line(self.screen, (0, 0, 0), 
+            pygame.draw.line(surface, (0, 0, 0), 
                             (0, self.HEIGHT_STEP*i), 
                             (self.SCREEN_WIDTH, self.HEIGHT_STEP*i))
 
+    def cell_rect(self, i, j):
+        return pygame.Rect(self.WIDTH_STEP * i, self.HEIGHT_STEP * j, self.WIDTH_STEP, self.HEIGHT_STEP)
+
+    def draw_cell(self, i, j):
+        # Only the cell drawn here is updated on the screen, so a move that
+        # NumPy would wrap round to another square must not get this far.
+        if not (0 <= i < self.SIZE and 0 <= j < self.SIZE):
+            raise IndexError(f"square {i},{j} is off the {self.SIZE}x{self.SIZE} board")
+        rect = self.cell_rect(i, j)
+        self.screen.blit(self.grid, rect, rect)
+        self.draw_mark(i, j)
+        self.dirty_rects.append(rect)
+
+    def draw_mark(self, i, j):
+        if self.state[i, j] == 1:
+            self.screen.blit(self.x, (self.WIDTH_STEP * i + self.WIDTH_STEP//2 - self.CHAR_WIDTH//2,
+                                        self.HEIGHT_STEP * j + self.HEIGHT_STEP//2 - self.CHAR_HEIGHT//2))
+        elif self.state[i, j] == -1:
+            self.screen.blit(self.o, (self.WIDTH_STEP * i + self.WIDTH_STEP//2 - self.CHAR_WIDTH//2,
+                                        self.HEIGHT_STEP * j + self.HEIGHT_STEP//2 - self.CHAR_HEIGHT//2))
+
+    def restore(self, rect):
+        # Puts back the grid and marks under rect, drawing only inside it.
+        self.screen.blit(self.grid, rect, rect)
+        self.screen.set_clip(rect)
+        for i in range(rect.left // self.WIDTH_STEP, min(self.SIZE, (rect.right - 1) // self.WIDTH_STEP + 1)):
+            for j in range(rect.top // self.HEIGHT_STEP, min(self.SIZE, (rect.bottom - 1) // self.HEIGHT_STEP + 1)):
+                self.draw_mark(i, j)
+        self.screen.set_clip(None)
+        self.dirty_rects.append(rect)
+
+    def present(self):
+        if self.dirty_rects:
+            pygame.display.update(self.dirty_rects)
+            self.dirty_rects = []
+
     def track_clicks(self, player):
         if not player.is_AI:
             x, y = pygame.mouse.get_pos()
@@ -327,10 +377,12 @@ class Board(pygame.sprite.Sprite):
         if player.char is 'x' and self.state[x, y] == 0:
             self.state[x, y] = 1
             self.move_number += 1
+            self.draw_cell(x, y)
 
         elif player.char is 'o' and self.state[x, y] == 0:
             self.state[x, y] =-1
             self.move_number += 1
+            self.draw_cell(x, y)
 
         for i in self.players:
             if i.char != player.char and i.is_AI:
@@ -342,17 +394,36 @@ class Board(pygame.sprite.Sprite):
         return 0
 
     def update(self):
-        for i in range(self.SIZE):
-            for j in range(self.SIZE):
-                if self.state[i, j] == 1:
-                    self.screen.blit(self.x, (self.WIDTH_STEP * i + self.WIDTH_STEP//2 - self.CHAR_WIDTH//2,
-                                                self.HEIGHT_STEP * j + self.HEIGHT_STEP//2 - self.CHAR_HEIGHT//2))
-                elif self.state[i, j] == -1:
-                    self.screen.blit(self.o, (self.WIDTH_STEP * i + self.WIDTH_STEP//2 - self.CHAR_WIDTH//2,
-                                    self.HEIGHT_STEP * j + self.HEIGHT_STEP//2 - self.CHAR_HEIGHT//2))
+        for i, j in self.stones():
+            self.draw_mark(i, j)
+
+    def new_state(self):
+        if self.sparse:
+            return SparseBoard(self.SIZE, self.WIN_SCORE)
+        return np.zeros((self.SIZE, self.SIZE))
+
+    def stones(self):
+        if self.sparse:
+            return list(self.state.cells)
+        return [(int(i), int(j)) for i, j in zip(*np.nonzero(self.state))]
+
+    def draw_status(self, text):
+        self.clear_status()
+        status = render_text(text, 'Times New Roman', 24)
+        x = (self.SCREEN_WIDTH - status.get_width()) // 2
+        y = self.SCREEN_HEIGHT - status.get_height() - 10
+        self.status_rect = status.get_rect(x=x, y=y).inflate(20, 10)
+        pygame.draw.rect(self.screen, (255, 255, 255), self.status_rect)
+        self.screen.blit(status, (x, y))
+        self.dirty_rects.append(self.status_rect)
+
+    def clear_status(self):
+        if self.status_rect is not None:
+            self.restore(self.status_rect)
+            self.status_rect = None
 
     def reset_board(self):
-        self.state = np.zeros((self.SIZE, self.SIZE))
+        self.state = self.new_state()
         self.move_number = 0
         for i in self.players:
             if i.is_AI:
@@ -408,7 +479,7 @@ class Board(pygame.sprite.Sprite):
 
 class Player():
 
-    def __init__(self, *, first=True, is_AI=False, SIZE=3, WIN_SCORE=3):
+    def __init__(self, *, first=True, is_AI=False, SIZE=3, WIN_SCORE=3, sparse=False):
 
         if first:
             self.char = 'x'
@@ -419,41 +490,137 @@ class Player():
         self.SIZE = SIZE
         self.WIN_SCORE = WIN_SCORE
         if self.is_AI:
-            self.engine = Engine(self.SIZE, self.WIN_SCORE, self.char)
+            self.engine = Engine(self.SIZE, self.WIN_SCORE, self.char, use_sparse_board=sparse)
+            self.engine.stop_event = threading.Event()
+        self.search_thread = None
+        self.search_move = None
+        self.search_start = 0
+        self.pondering = False
+        self.ponder_move = None
+        self.ponder_restore = None
 
     def board_player_interface(self, x, y):
+        if self.pondering:
+            if (x, y) == self.ponder_move:
+                # The position being pondered is already on the engine's
+                # board, so the search goes on as it is.
+                self.ponder_move = None
+                return
+            self.stop_pondering()
         if self.char == 'x':
             self.engine.state[x, y] = -1
         else:
             self.engine.state[x, y] = 1
 
     def player_board_interface(self):
-        self.engine.run()
-        return self.engine.current_move
+        self.search_thread.join()
+        self.search_thread = None
+        return self.search_move
+
+    # The engine searches in a background thread so that the window keeps
+    # drawing and handling events while it thinks.
+    def start_search(self):
+        if self.pondering:
+            # The opponent played the predicted move, so the ponder search
+            # becomes the search for this turn.
+            self.pondering = False
+            self.search_start = time.perf_counter()
+            return
+        self.engine.stop_event.clear()
+        self.search_move = None
+        self.search_start = time.perf_counter()
+        self.search_thread = threading.Thread(target=self.search, daemon=True)
+        self.search_thread.start()
+
+    def search(self):
+        state = self.engine.state.copy()
+        try:
+            self.engine.run()
+        except SearchTimeout:
+            # Only the iterative deepening models keep a best move when they
+            # are stopped, the others play the engine's fallback move.
+            self.engine.state = state
+            x, y = self.engine.fallback_move()
+            self.engine.state[x, y] = 1 if self.char == 'x' else -1
+            self.engine.current_move = (x, y)
+            self.engine.dummy_move = (x, y)
+        self.search_move = self.engine.current_move
+
+    def stop_search(self):
+        self.engine.stop_event.set()
+
+    def is_searching(self):
+        return self.search_thread is not None and self.search_thread.is_alive() and not self.pondering
+
+    def search_finished(self):
+        return self.search_thread is not None and not self.search_thread.is_alive() and not self.pondering
+
+    # Pondering: during the opponent's turn the engine plays the reply its
+    # last search expected on its own board and searches its answer. If the
+    # opponent plays that move the search has a head start, otherwise it is
+    # stopped and the board put back, and only what the engine keeps between
+    # searches, such as its transposition table, carries over.
+    def start_pondering(self):
+        move = self.engine.predicted_reply()
+        if move is None:
+            return
+        self.ponder_restore = (self.engine.state.copy(), self.engine.current_move,
+                               self.engine.dummy_move, self.engine.first_move)
+        x, y = move
+        self.engine.state[x, y] = -1 if self.char == 'x' else 1
+        self.start_search()
+        self.pondering = True
+        self.ponder_move = move
+
+    def stop_pondering(self):
+        if not self.pondering:
+            return
+        self.stop_search()
+        self.search_thread.join()
+        self.search_thread = None
+        self.pondering = False
+        self.ponder_move = None
+        (self.engine.state, self.engine.current_move,
+         self.engine.dummy_move, self.engine.first_move) = self.ponder_restore
+
+    def search_time(self):
+        return time.perf_counter() - self.search_start
 
     def player_reset(self):
+        self.stop_pondering()
         self.engine.reset()
 
 class Game():
-    def __init__(self):
-        self.io = IO()
+    FRAME_RATE = 30
+    AI_TIME_LIMIT = 30
+    PONDER = True
+    # Boards at least this large store only their stones, in the window and
+    # in the engines.
+    SPARSE_BOARD_SIZE = 20
+
+    def __init__(self, timer=None):
+        self.timer = timer or StartupTimer()
+        self.io = IO(timer=self.timer)
         self.io.welcome_user()
         self.io.show_ui_instructions()
         self.io.show_game_instructions()
         board_size, win_score, x_ai, o_ai = self.io.get_configuration()
-        self.player_x = Player(first=True,  is_AI=x_ai, SIZE=board_size, WIN_SCORE=win_score)
-        self.player_o = Player(first=False, is_AI=o_ai, SIZE=board_size, WIN_SCORE=win_score)
+        sparse = board_size >= self.SPARSE_BOARD_SIZE
+        self.player_x = Player(first=True,  is_AI=x_ai, SIZE=board_size, WIN_SCORE=win_score, sparse=sparse)
+        self.player_o = Player(first=False, is_AI=o_ai, SIZE=board_size, WIN_SCORE=win_score, sparse=sparse)
 
         x_ai_configuration = None
         o_ai_configuration = None
         if x_ai:
             x_ai_configuration = self.io.get_ai_configuration('X')
-            self.player_x.engine.model_setup(x_ai_configuration)
+            self.player_x.engine.model_setup(x_ai_configuration, use_sparse_board=sparse)
         if o_ai:
             o_ai_configuration = self.io.get_ai_configuration('O')
-            self.player_o.engine.model_setup(o_ai_configuration)
+            self.player_o.engine.model_setup(o_ai_configuration, use_sparse_board=sparse)
 
-        self.board = Board(800, 800, board_size, win_score, [self.player_x, self.player_o])
+        self.timer.begin('board')
+        self.board = Board(800, 800, board_size, win_score, [self.player_x, self.player_o], sparse)
+        self.timer.end('board')
         self.x_score = 0
         self.o_score = 0
         self.draw_score = 0
@@ -461,19 +628,42 @@ class Game():
         self.postgame = None
 
     def run_game(self):
+        clock = pygame.time.Clock()
+        self.board.draw_board()
         running = True
         while running:
+            if self.board.move_number % 2 == 0:
+                player = self.player_x
+            else:
+                player = self.player_o
+
             for event in pygame.event.get():
-                if (event.type == pygame.QUIT or
-                    event.type == pygame.KEYDOWN and 
-                    event.key == pygame.K_ESCAPE):
+                if event.type == pygame.QUIT:
+                    if player.is_searching():
+                        player.stop_search()
                     running = False
 
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    if self.board.move_number % 2 == 0:
-                        self.winner = self.board.track_clicks(self.player_x)
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                    # Escape while the AI thinks makes it move now, with the
+                    # best move it has found so far.
+                    if player.is_searching():
+                        player.stop_search()
                     else:
-                        self.winner = self.board.track_clicks(self.player_o)
+                        running = False
+
+                if event.type == pygame.MOUSEBUTTONDOWN and not player.is_searching():
+                    if player.is_AI:
+                        player.start_search()
+                    else:
+                        self.winner = self.board.track_clicks(player)
+
+            if player.is_searching() and player.search_time() > self.AI_TIME_LIMIT:
+                player.stop_search()
+            if player.search_finished():
+                self.winner = self.board.track_clicks(player)
+                opponent = self.player_o if player is self.player_x else self.player_x
+                if self.PONDER and self.winner == 0 and not opponent.is_AI:
+                    player.start_pondering()
 
             if self.winner is None:
                 self.draw_score += 1
@@ -487,11 +677,14 @@ class Game():
                 self.o_score += 1
                 self.postgame = self.io.postgame(self.winner, self.x_score, self.o_score, self.draw_score)
                 running = False
+            elif player.is_searching():
+                self.board.draw_status(f"{player.char.upper()} is thinking... {player.search_time():.1f}s"
+                                       " (Esc to move now)")
             else:
-                self.board.draw_board()
-                self.board.update()
+                self.board.clear_status()
 
-            pygame.display.flip()
+            self.board.present()
+            clock.tick(self.FRAME_RATE)
 
         self.post_game()
 
@@ -508,8 +701,16 @@ class Game():
         self.run_game()
 
 def main():
+    parser = argparse.ArgumentParser(description="Play k in a row against a person or the AI.")
+    parser.add_argument('--startup-timing', action='store_true',
+                        help="print how long each screen takes to build on stderr")
+    arguments = parser.parse_args()
+    timer = StartupTimer(PROCESS_START, arguments.startup_timing)
+    timer.end('imports')
+    timer.begin('pygame.init')
     pygame.init()
-    game = Game()
+    timer.end('pygame.init')
+    game = Game(timer)
     game.run_game()
     pygame.quit()
 
@@ -0,0 +1,185 @@
+import argparse
+import itertools
+import json
+import math
+import random
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from solver import Engine
+from rules import HeadlessBoard
+from options import parse_value
+
+class EngineConfig:
+    def __init__(self, name, configuration, options=None):
+        self.name = name
+        self.configuration = tuple(configuration)
+        self.options = dict(options or {})
+
+    @classmethod
+    def parse(cls, text):
+        # NAME=DEPTH,ALPHA_BETA,IMPROVEMENT,RANDOMISE[,option=value...]
+        # e.g. "d3=3,1,1,1,use_transposition_table=1,time_budget=0.2"
+        name, _, spec = text.partition('=')
+        fields = spec.split(',')
+        if len(fields) < 4:
+            raise ValueError(f"Engine configuration '{text}' needs a depth and three 0/1 flags")
+        depth, use_alpha_beta, use_improvement, use_randomisation = fields[:4]
+        configuration = (int(depth), use_alpha_beta == '1', use_improvement == '1', use_randomisation == '1')
+        options = {}
+        for field in fields[4:]:
+            key, _, value = field.partition('=')
+            options[key] = parse_value(value)
+        return cls(name, configuration, options)
+
+    def build(self, SIZE, WIN_SCORE, player):
+        engine = Engine(SIZE, WIN_SCORE, player)
+        engine.model_setup(self.configuration, **self.options)
+        return engine
+
+def play_game(task):
+    SIZE, WIN_SCORE, x_config, o_config, seed = task
+    random.seed(seed)
+    board = HeadlessBoard(SIZE, WIN_SCORE)
+    engines = {'x': x_config.build(SIZE, WIN_SCORE, 'x'),
+               'o': o_config.build(SIZE, WIN_SCORE, 'o')}
+    times = {'x': [], 'o': []}
+    nodes = {'x': [], 'o': []}
+    result = 0
+    forfeit = None
+
+    while result == 0:
+        player = board.to_move()
+        opponent = 'o' if player == 'x' else 'x'
+        engine = engines[player]
+        start = time.perf_counter()
+        engine.run()
+        times[player].append(time.perf_counter() - start)
+        nodes[player].append(engine.nodes)
+        x, y = engine.current_move
+        if not board.is_legal(x, y):
+            forfeit = player
+            result = -1 if player == 'x' else 1
+            break
+        result = board.play(x, y)
+        engines[opponent].state[x, y] = 1 if player == 'x' else -1
+
+    for engine in engines.values():
+        engine.shutdown()
+    return dict(x=x_config.name, o=o_config.name, result=result, moves=board.moves,
+                forfeit=forfeit, times=times, nodes=nodes)
+
+def elo_ratings(names, games, iterations=500):
+    ratings = {name: 0.0 for name in names}
+    for _ in range(iterations):
+        for name in names:
+            expected = 0
+            score = 0
+            played = 0
+            for game in games:
+                if name not in (game['x'], game['o']) or game['x'] == game['o']:
+                    continue
+                opponent = game['o'] if game['x'] == name else game['x']
+                expected += 1 / (1 + 10 ** ((ratings[opponent] - ratings[name]) / 400))
+                score += game_score(game, name)
+                played += 1
+            if played:
+                ratings[name] += 400 * (score - expected) / played
+                ratings[name] = max(-1000.0, min(1000.0, ratings[name]))
+    mean = sum(ratings.values()) / len(ratings)
+    return {name: round(1500 + rating - mean, 1) for name, rating in ratings.items()}
+
+def game_score(game, name):
+    if game['result'] is None:
+        return 0.5
+    winner = game['x'] if game['result'] > 0 else game['o']
+    return 1.0 if winner == name else 0.0
+
+def distribution(samples):
+    if not samples:
+        return {}
+    samples = np.asarray(samples, dtype=float)
+    return dict(count=len(samples), mean=float(samples.mean()),
+                p50=float(np.percentile(samples, 50)), p90=float(np.percentile(samples, 90)),
+                p99=float(np.percentile(samples, 99)), max=float(samples.max()))
+
+def summarise(configs, games):
+    names = [config.name for config in configs]
+    report = dict(engines={}, pairs={}, elo=elo_ratings(names, games), games=len(games))
+    for name in names:
+        times, nodes = [], []
+        wins = draws = losses = forfeits = 0
+        for game in games:
+            for player in ('x', 'o'):
+                if game[player] != name:
+                    continue
+                times += game['times'][player]
+                nodes += game['nodes'][player]
+                forfeits += game['forfeit'] == player
+                score = game_score(game, name) if game['x'] != game['o'] else None
+                if score == 1:
+                    wins += 1
+                elif score == 0.5:
+                    draws += 1
+                elif score == 0:
+                    losses += 1
+        report['engines'][name] = dict(wins=wins, draws=draws, losses=losses, forfeits=forfeits,
+                                       time_per_move=distribution(times),
+                                       nodes_per_move=distribution(nodes))
+    for first, second in itertools.combinations(names, 2):
+        pair = [game for game in games if {game['x'], game['o']} == {first, second}]
+        wins = sum(game_score(game, first) == 1 for game in pair)
+        draws = sum(game_score(game, first) == 0.5 for game in pair)
+        report['pairs'][f"{first} vs {second}"] = dict(wins=wins, draws=draws,
+                                                       losses=len(pair) - wins - draws)
+    return report
+
+def run_tournament(configs, SIZE, WIN_SCORE, games_per_pair, workers=None, seed=0):
+    tasks = []
+    for first, second in itertools.combinations(configs, 2):
+        for game in range(games_per_pair):
+            # Alternate colours so neither engine always has the first move.
+            x_config, o_config = (first, second) if game % 2 == 0 else (second, first)
+            tasks.append((SIZE, WIN_SCORE, x_config, o_config, seed + len(tasks)))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        games = list(pool.map(play_game, tasks, chunksize=max(1, len(tasks) // (8 * (workers or 8)))))
+    return summarise(configs, games), games
+
+def print_report(report):
+    print(f"{'engine':<16}{'elo':>8}{'win':>6}{'draw':>6}{'loss':>6}"
+          f"{'ms/move p50':>14}{'p99':>10}{'nodes/move p50':>16}{'p99':>10}")
+    for name, stats in report['engines'].items():
+        time_per_move = stats['time_per_move']
+        nodes_per_move = stats['nodes_per_move']
+        print(f"{name:<16}{report['elo'][name]:>8}{stats['wins']:>6}{stats['draws']:>6}{stats['losses']:>6}"
+              f"{1000 * time_per_move.get('p50', math.nan):>14.2f}{1000 * time_per_move.get('p99', math.nan):>10.2f}"
+              f"{nodes_per_move.get('p50', math.nan):>16.0f}{nodes_per_move.get('p99', math.nan):>10.0f}")
+    for pair, stats in report['pairs'].items():
+        print(f"{pair}: {stats['wins']}-{stats['draws']}-{stats['losses']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Play engine configurations against each other without a UI.")
+    parser.add_argument('--size', type=int, default=3)
+    parser.add_argument('--win-score', type=int, default=3)
+    parser.add_argument('--games', type=int, default=10, help="games per pair of engines")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engine', action='append', dest='engines', required=True,
+                        help="NAME=DEPTH,ALPHA_BETA,IMPROVEMENT,RANDOMISE[,option=value...]")
+    parser.add_argument('--json', help="write the full report and games to this file")
+    arguments = parser.parse_args()
+
+    configs = [EngineConfig.parse(text) for text in arguments.engines]
+    start = time.perf_counter()
+    report, games = run_tournament(configs, arguments.size, arguments.win_score, arguments.games,
+                                   arguments.workers, arguments.seed)
+    report['seconds'] = time.perf_counter() - start
+    print_report(report)
+    print(f"{report['games']} games in {report['seconds']:.1f}s")
+    if arguments.json:
+        with open(arguments.json, 'w') as output:
+            json.dump(dict(report=report, games=games), output, indent=1)
+
+if __name__ == '__main__':
+    main()
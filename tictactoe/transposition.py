@@ -0,0 +1,252 @@
+import random
+import struct
+import numpy as np
+from functools import lru_cache
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+class ZobristHash:
+    def __init__(self, SIZE, seed=0):
+        self.SIZE = SIZE
+        # A fixed seed keeps keys identical across processes and runs, so
+        # hashes can be shared between workers or written to disk.
+        generator = random.Random(seed)
+        self.keys = [[(generator.getrandbits(64), generator.getrandbits(64))
+                      for _ in range(self.SIZE)] for _ in range(self.SIZE)]
+        self.side_key = generator.getrandbits(64)
+
+    def piece_key(self, x, y, value):
+        return self.keys[x][y][0 if value > 0 else 1]
+
+    def hash_state(self, state, player):
+        key = 0 if player == 'x' else self.side_key
+        for i in range(self.SIZE):
+            for j in range(self.SIZE):
+                if state[i, j] != 0:
+                    key ^= self.piece_key(i, j, state[i, j])
+        return key
+
+class LazyZobristHash(ZobristHash):
+    # Keys are mixed from the seed and the square's index when a stone is
+    # first put on the square, so a large board only pays for the squares
+    # it uses. The keys are as fixed as ZobristHash's, but not the same.
+    MASK = (1 << 64) - 1
+
+    def __init__(self, SIZE, seed=0):
+        self.SIZE = SIZE
+        self.seed = seed
+        self.keys = {}
+        self.side_key = self.mix(2 * self.SIZE * self.SIZE)
+
+    def mix(self, index):
+        # The splitmix64 finaliser.
+        key = (self.seed * 0x9E3779B97F4A7C15 + (index + 1) * 0xBF58476D1CE4E5B9) & self.MASK
+        key = ((key ^ (key >> 30)) * 0xBF58476D1CE4E5B9) & self.MASK
+        key = ((key ^ (key >> 27)) * 0x94D049BB133111EB) & self.MASK
+        return key ^ (key >> 31)
+
+    def piece_key(self, x, y, value):
+        index = 2 * (x * self.SIZE + y) + (0 if value > 0 else 1)
+        key = self.keys.get(index)
+        if key is None:
+            key = self.keys[index] = self.mix(index)
+        return key
+
+    def hash_state(self, state, player):
+        key = 0 if player == 'x' else self.side_key
+        for (x, y), value in state.cells.items():
+            key ^= self.piece_key(x, y, value)
+        return key
+
+# The eight symmetries of the square, as maps of (x, y) on a board of side n:
+# the identity, the three rotations, and the four reflections.
+SYMMETRIES = (
+    lambda x, y, n: (x, y),
+    lambda x, y, n: (y, n - 1 - x),
+    lambda x, y, n: (n - 1 - x, n - 1 - y),
+    lambda x, y, n: (n - 1 - y, x),
+    lambda x, y, n: (x, n - 1 - y),
+    lambda x, y, n: (n - 1 - x, y),
+    lambda x, y, n: (y, x),
+    lambda x, y, n: (n - 1 - y, n - 1 - x),
+)
+
+@lru_cache(maxsize=None)
+def symmetry_maps(SIZE):
+    maps = tuple(tuple(tuple(symmetry(x, y, SIZE) for y in range(SIZE)) for x in range(SIZE))
+                 for symmetry in SYMMETRIES)
+    cells = [(x, y) for x in range(SIZE) for y in range(SIZE)]
+    inverses = []
+    for forward in maps:
+        for t, backward in enumerate(maps):
+            if all(backward[forward[x][y][0]][forward[x][y][1]] == (x, y) for x, y in cells):
+                inverses.append(t)
+                break
+    return maps, tuple(inverses)
+
+class SymmetricZobristHash(ZobristHash):
+    # Keeps one key per symmetry of the board, the key the position would
+    # have after that rotation or reflection. The smallest of them is the
+    # same for all eight images of a position, and a position is symmetric
+    # under every symmetry whose key equals the identity's.
+    def __init__(self, SIZE, seed=0):
+        super().__init__(SIZE, seed)
+        self.maps, self.inverses = symmetry_maps(self.SIZE)
+        self.move_keys = [[tuple(tuple(self.piece_key(*self.maps[s][x][y], value) ^ self.side_key
+                                       for s in range(len(self.maps)))
+                                 for value in (1, -1))
+                           for y in range(self.SIZE)] for x in range(self.SIZE)]
+
+    def hash_states(self, state, player):
+        keys = [0 if player == 'x' else self.side_key] * len(self.maps)
+        for i in range(self.SIZE):
+            for j in range(self.SIZE):
+                if state[i, j] != 0:
+                    keys = [key ^ self.piece_key(*self.maps[s][i][j], state[i, j])
+                            for s, key in enumerate(keys)]
+        return keys
+
+    def update(self, keys, x, y, value):
+        move_keys = self.move_keys[x][y][0 if value > 0 else 1]
+        return [key ^ move_key for key, move_key in zip(keys, move_keys)]
+
+    def canonical(self, keys):
+        key = min(keys)
+        return key, keys.index(key)
+
+    def stabiliser(self, keys):
+        return [s for s in range(1, len(keys)) if keys[s] == keys[0]]
+
+    def to_canonical(self, move, symmetry):
+        if move is None or move == (-1, -1):
+            return move
+        return self.maps[symmetry][move[0]][move[1]]
+
+    def from_canonical(self, move, symmetry):
+        if move is None or move == (-1, -1):
+            return move
+        return self.maps[self.inverses[symmetry]][move[0]][move[1]]
+
+class TranspositionTable:
+    def __init__(self, size=2**18):
+        self.size = size
+        self.table = [None] * self.size
+        self.generation = 0
+        self.hits = 0
+        self.stores = 0
+
+    def clear(self):
+        self.table = [None] * self.size
+        self.generation = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def probe(self, key):
+        entry = self.table[key % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, value, bound, depth, move):
+        index = key % self.size
+        entry = self.table[index]
+        # Depth preferred replacement: an entry is only overwritten by a
+        # deeper search of any position, or by anything once it is left
+        # over from an earlier move.
+        if (entry is None or entry[0] == key or depth >= entry[3]
+                or entry[5] != self.generation):
+            self.table[index] = (key, value, bound, depth, move, self.generation)
+            self.stores += 1
+
+VALUE_BITS = 32
+DEPTH_BITS = 10
+BOUND_BITS = 2
+MOVE_BITS = 16
+GENERATION_BITS = 4
+MAX_DEPTH = (1 << DEPTH_BITS) - 1
+
+class SharedTranspositionTable:
+    # Each slot holds two unsigned 64 bit integers, the entry packed into one
+    # word and that word XORed with the key in the other. A reader that
+    # catches a half written slot sees a key mismatch and treats it as a
+    # miss, so no locks are needed between processes.
+    def __init__(self, SIZE, size=2**18, name=None):
+        from multiprocessing import shared_memory
+        self.SIZE = SIZE
+        self.size = size
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=self.size * 16)
+            self.owner = True
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.name = self.memory.name
+        self.table = np.ndarray((self.size, 2), dtype=np.uint64, buffer=self.memory.buf)
+        if self.owner:
+            self.table[:] = 0
+        self.generation = 0
+        self.hits = 0
+        self.stores = 0
+
+    def clear(self):
+        self.table[:] = 0
+        self.generation = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def pack(self, value, bound, depth, move):
+        value_bits = struct.unpack('<I', struct.pack('<f', value))[0]
+        move_index = 0 if move is None or move == (-1, -1) else move[0] * self.SIZE + move[1] + 1
+        return (value_bits
+                | min(depth, MAX_DEPTH) << VALUE_BITS
+                | bound << (VALUE_BITS + DEPTH_BITS)
+                | move_index << (VALUE_BITS + DEPTH_BITS + BOUND_BITS)
+                | (self.generation % (1 << GENERATION_BITS)) << (VALUE_BITS + DEPTH_BITS + BOUND_BITS + MOVE_BITS))
+
+    def unpack(self, key, data):
+        value = struct.unpack('<f', struct.pack('<I', data & 0xFFFFFFFF))[0]
+        data >>= VALUE_BITS
+        depth = data & MAX_DEPTH
+        # Depths beyond the field width are only ever full depth searches.
+        if depth == MAX_DEPTH:
+            depth = np.inf
+        data >>= DEPTH_BITS
+        bound = data & ((1 << BOUND_BITS) - 1)
+        data >>= BOUND_BITS
+        move_index = data & ((1 << MOVE_BITS) - 1)
+        move = (-1, -1) if move_index == 0 else divmod(move_index - 1, self.SIZE)
+        generation = data >> MOVE_BITS
+        return key, value, bound, depth, move, generation
+
+    def probe(self, key):
+        slot = self.table[key % self.size]
+        data = int(slot[1])
+        if data != 0 and int(slot[0]) ^ data == key:
+            self.hits += 1
+            return self.unpack(key, data)
+        return None
+
+    def store(self, key, value, bound, depth, move):
+        index = key % self.size
+        slot = self.table[index]
+        data = int(slot[1])
+        if data != 0:
+            entry = self.unpack(int(slot[0]) ^ data, data)
+            if not (entry[0] == key or depth >= entry[3]
+                    or entry[5] != self.generation % (1 << GENERATION_BITS)):
+                return
+        data = self.pack(value, bound, depth, move)
+        slot[1] = data
+        slot[0] = key ^ data
+        self.stores += 1
+
+    def close(self):
+        self.table = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()